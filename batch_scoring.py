@@ -0,0 +1,209 @@
+"""Offline-Bewertung großer Nennungen-Listen über die OpenAI Batch API.
+
+Alle Anfragen werden als JSONL-Datei hochgeladen und als asynchroner Batch-Job
+verarbeitet. Das ist langsamer als die Live-Bewertung, aber deutlich günstiger und
+ohne Rate-Limit-Probleme. Fehlgeschlagene Anfragen werden in einem neuen Job
+erneut eingereiht. Ein bereits eingereichter Job lässt sich nach einem Neustart wieder
+aufnehmen, statt die Anfragen ein zweites Mal einzureichen und zu bezahlen.
+"""
+import json
+import tempfile
+import time
+
+from scoring import ScoringError, build_message_content, error_result
+
+# Name des Backends in der Oberfläche
+BACKEND_BATCH = "batch"
+
+# Status, in denen sich ein Batch-Job nicht mehr verändert
+TERMINAL_BATCH_STATUS = {"completed", "failed", "expired", "cancelled"}
+
+# Status, in denen ein früherer Batch-Job keine Ergebnisse mehr liefert und nicht wieder aufgenommen wird
+UNUSABLE_BATCH_STATUS = {"failed", "expired", "cancelled", "cancelling"}
+
+# Höchstzahl der Anfragen in einem Batch-Job laut Batch API
+MAX_BATCH_REQUESTS = 50000
+
+# Standardwerte für Abfrageintervall und Wiederholungen
+DEFAULT_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 60
+DEFAULT_MAX_ROUNDS = 3
+
+
+def custom_id_for(index):
+    """Request-ID einer Antwort innerhalb des Batch-Jobs."""
+    return f"antwort-{index}"
+
+
+def index_from_custom_id(custom_id):
+    """Gegenstück zu custom_id_for."""
+    return int(custom_id.rsplit("-", 1)[1])
+
+
+def write_batch_file(file, frage, antworten, indices, model, instructions):
+    """Schreibt für jede Antwort aus indices eine Chat-Completions-Anfrage als JSONL-Zeile in file."""
+    for index in indices:
+        request = {
+            "custom_id": custom_id_for(index),
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": instructions},
+                    {"role": "user", "content": build_message_content(frage, antworten[index])}
+                ]
+            }
+        }
+        file.write(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+
+
+def submit_batch(client, frage, antworten, indices, model, instructions):
+    """Lädt die Anfragen für indices hoch, startet den Batch-Job und gibt ihn zurück."""
+    with tempfile.TemporaryFile() as batch_file:
+        write_batch_file(batch_file, frage, antworten, indices, model, instructions)
+        batch_file.seek(0)
+        input_file = client.files.create(file=("bonsai_score_batch.jsonl", batch_file), purpose="batch")
+
+    return client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+
+
+def wait_for_batch(client, batch_id, poll_interval=DEFAULT_POLL_INTERVAL, max_poll_interval=MAX_POLL_INTERVAL, on_status=None, cancel_event=None):
+    """Fragt den Batch-Job ab, bis er einen Endstatus erreicht, und gibt ihn zurück.
+
+    Das Intervall verdoppelt sich bis max_poll_interval, damit lange Jobs nur
+    wenige Abfragen kosten. on_status(batch) wird nach jeder Abfrage aufgerufen.
+    Wird cancel_event (threading.Event) gesetzt, endet das Warten sofort und der
+    Batch-Job wird auch bei der API abgebrochen, damit er nicht weiterläuft und kostet.
+    """
+    interval = poll_interval
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if on_status:
+            on_status(batch)
+        if batch.status in TERMINAL_BATCH_STATUS:
+            return batch
+        if cancel_event is None:
+            time.sleep(interval)
+        elif cancel_event.wait(interval):
+            return client.batches.cancel(batch_id)
+        interval = min(interval * 2, max_poll_interval)
+
+
+def iter_result_file(client, file_id):
+    """Liest eine Ergebnis- oder Fehlerdatei zeilenweise, ohne sie komplett zu laden."""
+    if not file_id:
+        return
+    with client.files.with_streaming_response.content(file_id) as response:
+        for line in response.iter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_batch_line(line):
+    """Wandelt eine Zeile der Ergebnisdatei in (index, result, fehlermeldung) um."""
+    index = index_from_custom_id(line["custom_id"])
+    response = line.get("response") or {}
+    if response.get("status_code") != 200:
+        error = line.get("error") or (response.get("body") or {}).get("error") or {}
+        return index, None, error.get("message") or f"HTTP-Status {response.get('status_code')}"
+
+    body = response["body"]
+    usage = body.get("usage") or {}
+    codierung = (body["choices"][0]["message"].get("content") or "").strip() or "Keine Antwort vom Modell erhalten"
+    result = {
+        "codierung": codierung,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+        "requests": 1,
+        "latency": None,
+    }
+    return index, result, None
+
+
+def resume_batch(client, antworten, previous_batch):
+    """Nimmt einen früher eingereichten Batch-Job für dieselben Antworten wieder auf.
+
+    previous_batch ist (batch_id, [[index, antwort], ...]) wie von on_submit bei
+    run_batch_job gemeldet. Gibt (batch, zuordnung) zurück; zuordnung bildet die Indizes
+    des früheren Jobs auf die Indizes in antworten ab. Passt keine Antwort mehr oder
+    liefert der Job keine Ergebnisse mehr, wird (None, None) zurückgegeben.
+    """
+    batch_id, eintraege = previous_batch
+    positionen = {}
+    for index, antwort in enumerate(antworten):
+        positionen.setdefault(antwort, []).append(index)
+    zuordnung = {alt: positionen[antwort] for alt, antwort in eintraege if antwort in positionen}
+    if not zuordnung:
+        return None, None
+    try:
+        batch = client.batches.retrieve(batch_id)
+    except Exception:
+        return None, None
+    if batch.status in UNUSABLE_BATCH_STATUS:
+        return None, None
+    return batch, zuordnung
+
+
+def run_batch_job(client, frage, antworten, model, instructions, max_rounds=DEFAULT_MAX_ROUNDS,
+                  poll_interval=DEFAULT_POLL_INTERVAL, on_status=None, previous_batch=None, on_submit=None, cancel_event=None):
+    """Bewertet alle Antworten über die Batch API.
+
+    Liefert wie scoring.score_antworten Tupel (index, result, fehler), sobald die
+    Ergebnisdatei eines Jobs gelesen wird. Anfragen ohne erfolgreiches Ergebnis werden
+    in bis zu max_rounds Jobs erneut eingereicht; erst danach wird ein Fehler gemeldet.
+    on_status(batch, runde) wird bei jeder Statusabfrage aufgerufen.
+    on_submit(batch_id, [[index, antwort], ...]) meldet jeden eingereichten Job, z.B. für
+    das Journal. previous_batch (siehe resume_batch) wird in der ersten Runde wieder
+    aufgenommen; Antworten, die er nicht enthält, werden in der nächsten Runde eingereicht.
+    Nach einem Abbruch über cancel_event endet der Generator ohne weitere Ergebnisse.
+    """
+    pending = list(range(len(antworten)))
+    last_errors = {}
+
+    for runde in range(1, max_rounds + 1):
+        if not pending:
+            return
+
+        batch, zuordnung = resume_batch(client, antworten, previous_batch) if runde == 1 and previous_batch else (None, None)
+        if batch is None:
+            batch = submit_batch(client, frage, antworten, pending, model, instructions)
+            if on_submit:
+                on_submit(batch.id, [[index, antworten[index]] for index in pending])
+        poll_start = time.perf_counter()
+        batch = wait_for_batch(
+            client,
+            batch.id,
+            poll_interval=poll_interval,
+            on_status=(lambda b: on_status(b, runde)) if on_status else None,
+            cancel_event=cancel_event
+        )
+        if cancel_event is not None and cancel_event.is_set():
+            return
+
+        polling_time = time.perf_counter() - poll_start
+
+        done = set()
+        round_errors = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            for line in iter_result_file(client, file_id):
+                index, result, error_message = parse_batch_line(line)
+                for index in (zuordnung.get(index, []) if zuordnung is not None else [index]):
+                    if result is None:
+                        round_errors[index] = error_message
+                    elif index not in done:
+                        done.add(index)
+                        yield index, {**result, "attempts": runde, "status": batch.status, "polling_time": polling_time}, None
+
+        # Nur die fehlgeschlagenen bzw. fehlenden Anfragen erneut einreihen
+        pending = [index for index in pending if index not in done]
+        for index in pending:
+            last_errors[index] = round_errors.get(index, f"Batch-Job {batch.id} endete mit Status {batch.status}")
+
+    for index in pending:
+        fehler = ScoringError(f"Fehler nach {max_rounds} Batch-Jobs: {last_errors[index]}", attempts=max_rounds, status=batch.status)
+        yield index, error_result(fehler), fehler
@@ -0,0 +1,59 @@
+"""Exportdateien der Ergebnisse als XLSX, CSV und Parquet.
+
+Die XLSX-Datei wird mit openpyxl im Write-only-Modus zeilenweise geschrieben, ohne
+für jede Zelle ein Objekt im Speicher zu halten. CSV und Parquet sind für große
+Ergebnismengen deutlich schneller und kleiner.
+"""
+import io
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+# MIME-Typen der Exportformate
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIME = "text/csv"
+PARQUET_MIME = "application/vnd.apache.parquet"
+
+
+def _cell(worksheet, value):
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    if hasattr(value, "item"):
+        # numpy-Skalare in Python-Werte umwandeln
+        value = value.item()
+    if isinstance(value, str):
+        value = ILLEGAL_CHARACTERS_RE.sub("", value)
+        if value.startswith("="):
+            # Antworten wie "=)" nicht als Formel schreiben
+            cell = WriteOnlyCell(worksheet, value)
+            cell.data_type = "s"
+            return cell
+    return value
+
+
+def xlsx_bytes(sheets):
+    """Schreibt eine Arbeitsmappe mit einem Blatt pro (name, df, index) und gibt die Bytes zurück."""
+    workbook = openpyxl.Workbook(write_only=True)
+    for name, df, index in sheets:
+        worksheet = workbook.create_sheet(title=name[:31])
+        if index:
+            df = df.reset_index()
+        worksheet.append([str(column) for column in df.columns])
+        for row in df.itertuples(index=False, name=None):
+            worksheet.append([_cell(worksheet, value) for value in row])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def csv_bytes(df):
+    """CSV mit BOM, damit Excel Umlaute korrekt erkennt."""
+    return df.to_csv(index=False).encode("utf-8-sig")
+
+
+def parquet_bytes(df):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
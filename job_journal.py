@@ -0,0 +1,267 @@
+"""Dauerhaftes Journal für Bewertungsjobs.
+
+Jeder Job erhält eine ID und eine JSONL-Datei. Die erste Zeile beschreibt den Job
+(Besitzer, Frage, Antworten, Einstellungen), jede weitere Zeile enthält eine fertig
+bewertete Antwort oder einen eingereichten Batch-Job und wird sofort geschrieben. Nach
+einem Neustart des Servers oder einem geschlossenen Browser-Tab lässt sich ein Job
+fortsetzen, ohne bereits bezahlte Bewertungen erneut anzufragen. Abgeschlossene Jobs
+werden zu einer kompakten JSON-Datei zusammengefasst, Journale älter als die
+Aufbewahrungsfrist gelöscht.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+# Standardverzeichnis für die Journale
+DEFAULT_JOURNAL_DIR = ".jobs"
+
+# Nach so vielen Einträgen wird zusätzlich fsync aufgerufen
+FSYNC_INTERVAL = 20
+
+# Journale und kompakte Ergebnisse, die so lange nicht verändert wurden, werden gelöscht (Tage)
+JOURNAL_RETENTION_DAYS = 30
+
+# Endung der Aufruf-Protokolle (telemetry.CallTrace), die neben den Journalen liegen
+TRACE_SUFFIX = ".trace.jsonl"
+
+# Eine Ergebniszeile im Journal, so wie json.dumps sie schreibt
+_RESULT_MARKER = b'"type": "result"'
+
+# Kurzübersicht pro Journal für list_unfinished_jobs: Pfad -> (Größe, Änderungszeit, Übersicht)
+_summaries = {}
+_summaries_lock = threading.Lock()
+
+
+def new_job_id():
+    """Job-ID aus Zeitstempel und Zufallsanteil, sortiert chronologisch."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class JobJournal:
+    """Journal eines Bewertungsjobs; results enthält index -> Codierung aller fertigen Antworten.
+
+    batch ist der zuletzt eingereichte Batch-Job als (batch_id, [[index, antwort], ...])
+    oder None; beim Fortsetzen wird er wieder aufgenommen statt neu eingereicht.
+    """
+
+    def __init__(self, path, header, results=None, batch=None):
+        self.path = path
+        self.header = header
+        self.results = results or {}
+        self.batch = batch
+        self._file = None
+        self._unsynced = 0
+        # Beim Absturz kann die letzte Zeile unvollständig geblieben sein
+        self._needs_newline = False
+
+    @property
+    def job_id(self):
+        return self.header["job_id"]
+
+    @property
+    def frage(self):
+        return self.header["frage"]
+
+    @property
+    def antworten(self):
+        return self.header["antworten"]
+
+    @property
+    def settings(self):
+        return self.header["settings"]
+
+    @property
+    def owner(self):
+        return self.header.get("owner")
+
+    @classmethod
+    def create(cls, directory, frage, antworten, settings, owner=None):
+        """Legt ein neues Journal an und schreibt die Job-Beschreibung.
+
+        Eine übergebene Liste wird nicht kopiert, so teilen sich z.B. die Varianten eines
+        Experiments eine Antwortliste.
+        """
+        os.makedirs(directory, exist_ok=True)
+        job_id = new_job_id()
+        header = {
+            "type": "job",
+            "job_id": job_id,
+            "owner": owner,
+            "created_at": time.time(),
+            "frage": frage,
+            "antworten": antworten if isinstance(antworten, list) else list(antworten),
+            "settings": settings,
+        }
+        journal = cls(os.path.join(directory, f"{job_id}.jsonl"), header)
+        journal._write(header, sync=True)
+        return journal
+
+    @classmethod
+    def load(cls, path):
+        """Liest ein Journal; eine beim Absturz abgeschnittene letzte Zeile wird ignoriert."""
+        header, results, batch = None, {}, None
+        line = ""
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("type") == "job":
+                    header = entry
+                elif entry.get("type") == "result":
+                    results[entry["index"]] = entry["codierung"]
+                elif entry.get("type") == "batch":
+                    batch = (entry["batch_id"], entry["antworten"])
+        if header is None:
+            raise ValueError(f"Journal ohne Job-Beschreibung: {path}")
+        journal = cls(path, header, results, batch)
+        journal._needs_newline = not line.endswith("\n")
+        return journal
+
+    def _write(self, entry, sync=False):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+            if self._needs_newline:
+                self._file.write("\n")
+                self._needs_newline = False
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._unsynced += 1
+        if sync or self._unsynced >= FSYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def record(self, index, codierung):
+        """Schreibt eine fertig bewertete Antwort sofort ins Journal."""
+        self.results[index] = codierung
+        self._write({"type": "result", "index": index, "codierung": codierung})
+
+    def record_batch(self, batch_id, eintraege):
+        """Merkt sich einen eingereichten Batch-Job mit seinen Anfragen als [[index, antwort], ...]."""
+        self.batch = (batch_id, eintraege)
+        self._write({"type": "batch", "batch_id": batch_id, "antworten": eintraege}, sync=True)
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def release(self):
+        """Gibt Antworten und Ergebnisse im Speicher frei, die Datei bleibt unverändert (siehe load_job_results)."""
+        self.header = {**self.header, "antworten": []}
+        self.results = {}
+        self.batch = None
+
+    def complete(self):
+        """Fasst das Journal eines abgeschlossenen Jobs zu einer kompakten JSON-Datei zusammen."""
+        self.close()
+        compact = {
+            **self.header,
+            "type": "completed_job",
+            "completed_at": time.time(),
+            "codierungen": [self.results.get(index) for index in range(len(self.antworten))],
+        }
+        compact_path = self.path[:-len(".jsonl")] + ".json"
+        temp_path = compact_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(compact, file, ensure_ascii=False)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, compact_path)
+        os.remove(self.path)
+        self.path = compact_path
+
+
+def trace_path(directory, job_id):
+    """Pfad des vollständigen Aufruf-Protokolls eines Jobs."""
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{job_id}{TRACE_SUFFIX}")
+
+
+def load_job_results(directory, job_id):
+    """Antworten und Codierungen (None für offene) eines Jobs aus seinem Journal.
+
+    Gelesen wird die kompakte JSON-Datei eines abgeschlossenen Jobs, sonst das JSONL-Journal.
+    """
+    compact_path = os.path.join(directory, f"{job_id}.json")
+    if os.path.exists(compact_path):
+        with open(compact_path, encoding="utf-8") as file:
+            job = json.load(file)
+        return job["antworten"], job["codierungen"]
+    journal = JobJournal.load(os.path.join(directory, f"{job_id}.jsonl"))
+    return journal.antworten, [journal.results.get(index) for index in range(len(journal.antworten))]
+
+
+def _read_summary(path, previous):
+    """Übersicht eines Journals; die Job-Beschreibung wird nur gelesen, wenn previous fehlt."""
+    with open(path, "rb") as file:
+        first_line = file.readline()
+        if previous is None:
+            header = json.loads(first_line)
+            if header.get("type") != "job":
+                raise ValueError(f"Journal ohne Job-Beschreibung: {path}")
+            previous = {
+                "job_id": header["job_id"],
+                "owner": header.get("owner"),
+                "created_at": header["created_at"],
+                "frage": header["frage"],
+                "antwort_count": len(header["antworten"]),
+                "backend": header["settings"]["backend"],
+                "path": path,
+            }
+        # Nur Ergebniszeilen zählen, ohne sie zu parsen
+        result_count = sum(line.count(_RESULT_MARKER) for line in file)
+    return {**previous, "result_count": result_count}
+
+
+def list_unfinished_jobs(directory=DEFAULT_JOURNAL_DIR, owner=None, retention_days=JOURNAL_RETENTION_DAYS):
+    """Übersicht aller noch nicht abgeschlossenen Jobs eines Besitzers, der neueste zuerst.
+
+    Jeder Eintrag ist ein Dict mit job_id, owner, created_at, modified_at, frage,
+    antwort_count, result_count, backend und path; zum Fortsetzen wird das Journal mit
+    JobJournal.load gelesen. Ein Journal wird nur neu gelesen, wenn es sich geändert hat,
+    und auch dann nur die Job-Beschreibung beim ersten Mal. Journale und kompakte
+    Ergebnisse, die länger als retention_days nicht verändert wurden, werden gelöscht,
+    auch solche mit dauerhaft fehlgeschlagenen Antworten, ebenso die Aufruf-Protokolle.
+    """
+    if not os.path.isdir(directory):
+        return []
+    cutoff = time.time() - retention_days * 86400
+    jobs, seen = [], set()
+    for entry in sorted(os.scandir(directory), key=lambda entry: entry.name, reverse=True):
+        if not entry.name.endswith((".jsonl", ".json")):
+            continue
+        try:
+            stat = entry.stat()
+            if stat.st_mtime < cutoff:
+                os.remove(entry.path)
+                with _summaries_lock:
+                    _summaries.pop(entry.path, None)
+                continue
+            if not entry.name.endswith(".jsonl") or entry.name.endswith(TRACE_SUFFIX):
+                continue
+            seen.add(entry.path)
+            with _summaries_lock:
+                cached = _summaries.get(entry.path)
+            if cached is None or cached[:2] != (stat.st_size, stat.st_mtime_ns):
+                summary = _read_summary(entry.path, cached[2] if cached else None)
+                with _summaries_lock:
+                    _summaries[entry.path] = (stat.st_size, stat.st_mtime_ns, summary)
+            else:
+                summary = cached[2]
+        except (OSError, ValueError, KeyError):
+            continue
+        if owner is None or summary["owner"] == owner:
+            jobs.append({**summary, "modified_at": stat.st_mtime})
+
+    # Übersichten abgeschlossener oder gelöschter Journale verwerfen
+    with _summaries_lock:
+        prefix = os.path.join(directory, "")
+        for path in [path for path in _summaries if path.startswith(prefix) and path not in seen]:
+            del _summaries[path]
+    return jobs
@@ -0,0 +1,577 @@
+"""Prozessweiter Job-Manager für Bewertungsjobs.
+
+Die Bewertung läuft in Hintergrund-Threads statt im Skript-Thread der Streamlit-Sitzung.
+Ein Job überlebt damit Reruns und geschlossene Browser-Tabs, und die Oberfläche fragt
+nur noch Status und Fortschritt ab. Alle Jobs teilen sich ein gemeinsames
+Anfrage- und Token-Budget (rate_limit.RateGovernor). Ein frei werdender Platz geht an den
+Nutzer mit den wenigsten laufenden Jobs, damit ein Nutzer mit vielen Jobs die anderen
+nicht blockiert.
+"""
+import collections
+import concurrent.futures
+import os
+import threading
+import time
+
+from batch_scoring import BACKEND_BATCH, run_batch_job
+from job_journal import load_job_results, new_job_id, trace_path
+from local_rules import DEFAULT_BLOCKLIST, default_rules, score_locally
+from prompt_store import shared_prompt
+from result_store import ResultStore
+from score_cache import score_with_cache
+from scoring import BACKEND_ASSISTANTS, group_antworten, make_scorer, score_antworten
+from telemetry import CallTrace
+
+# Status eines Jobs
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_JOB_STATUS = {JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED}
+
+# Anzahl gleichzeitig laufender Jobs im ganzen Prozess
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+
+# So lange bleiben beendete Jobs abrufbar (Sekunden); ihre Antworten und Codierungen
+# liegen dann nur noch im Journal auf der Festplatte
+FINISHED_JOB_RETENTION = 3600
+
+# Höchstens so viele Fehlermeldungen pro Job aufbewahren
+MAX_ERROR_MESSAGES = 50
+
+# Einstellungen mit Prompt-Texten, die sich alle Jobs über prompt_store teilen
+PROMPT_SETTINGS = ["system_prompt", "run_instructions", "assistant_instructions"]
+
+
+class ScoringJob:
+    """Ein Bewertungsjob mit Fortschritt und Kennzahlen; wird vom Hintergrund-Thread aktualisiert."""
+
+    def __init__(self, journal, owner, trace=None):
+        self.journal = journal
+        self.owner = owner
+        self.job_id = journal.job_id
+        self.status = JOB_QUEUED
+        self.message = "Wartet auf einen freien Platz..."
+        self.store = ResultStore(journal.antworten)
+        self.total = len(journal.antworten)
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        # Ringpuffer für die Anzeige, alle Aufrufe zusätzlich in einer Datei neben dem Journal
+        self.trace = trace or CallTrace(path=trace_path(os.path.dirname(journal.path), self.job_id))
+        self.errors = []
+        for key in PROMPT_SETTINGS:
+            if journal.settings.get(key):
+                journal.settings[key] = shared_prompt(journal.settings[key])
+
+        # Zähler für Fortschritt und Kennzahlen pro Antwort
+        self.resumed_count = 0
+        self.open_count = 0
+        self.unique_count = 0
+        self.processed_count = 0
+        self.error_count = 0
+        self.cache_hits = 0
+        self.local_hits = 0
+        self.request_count = 0.0
+        self.total_latency = 0.0
+        self.latency_count = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def settings(self):
+        return self.journal.settings
+
+    @property
+    def title(self):
+        return self.journal.frage
+
+    @property
+    def journal_ids(self):
+        """IDs der Journale, die dieser Job schreibt."""
+        return [self.job_id]
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_JOB_STATUS
+
+    @property
+    def progress(self):
+        """Anteil der bearbeiteten Antworten (inklusive Fehler) zwischen 0 und 1."""
+        if not self.total:
+            return 1.0
+        return min(1.0, (self.resumed_count + self.processed_count + self.error_count) / self.total)
+
+    def run(self, client, assistant_id, governor=None, score_cache=None):
+        run_job(self, client, assistant_id, governor=governor, score_cache=score_cache)
+
+    def results(self):
+        """Antworten und Codierungen (None für offene); nach release() aus dem Journal gelesen."""
+        store = self.store
+        if store is not None:
+            return store.antworten, store.codierungen
+        return load_job_results(os.path.dirname(self.journal.path), self.job_id)
+
+    def release(self):
+        """Gibt Ergebnisspeicher und Antwortlisten eines beendeten Jobs frei; Zähler und Meldungen bleiben."""
+        self.store = None
+        self.journal.release()
+
+
+def _summed(name):
+    return property(lambda self: sum(getattr(part, name) for part in self.parts))
+
+
+class CombinedJob:
+    """Mehrere ScoringJobs als ein Job mit gemeinsamem Worker-Pool.
+
+    Jeder Teil ist ein eigener ScoringJob mit eigenem Journal (parts). Alle Teile laufen
+    gleichzeitig und reichen ihre Anfragen in denselben Pool ein, statt einer nach dem
+    anderen bewertet zu werden. Zähler und Fortschritt sind die Summe der Teile.
+    Unterklassen setzen labels (Bezeichnung pro Teil) und part_name für die Statusmeldung
+    und optional grouping, wenn alle Teile dieselben Antworten bewerten (siehe run_job).
+    """
+
+    part_name = "Teile"
+    grouping = None
+
+    resumed_count = _summed("resumed_count")
+    open_count = _summed("open_count")
+    unique_count = _summed("unique_count")
+    processed_count = _summed("processed_count")
+    error_count = _summed("error_count")
+    cache_hits = _summed("cache_hits")
+    local_hits = _summed("local_hits")
+    request_count = _summed("request_count")
+    total_latency = _summed("total_latency")
+    latency_count = _summed("latency_count")
+    prompt_tokens = _summed("prompt_tokens")
+    completion_tokens = _summed("completion_tokens")
+    total = _summed("total")
+
+    def __init__(self, owner, journals, labels):
+        self.job_id = new_job_id()
+        self.owner = owner
+        self.labels = labels
+        self.status = JOB_QUEUED
+        self.message = "Wartet auf einen freien Platz..."
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        # Alle Teile schreiben in denselben Ringpuffer und dieselbe Datei
+        self.trace = CallTrace(path=trace_path(os.path.dirname(journals[0].path), self.job_id))
+        self.parts = [ScoringJob(journal, owner, trace=self.trace) for journal in journals]
+        for part in self.parts:
+            part.cancel_event = self.cancel_event
+
+    @property
+    def settings(self):
+        return self.parts[0].settings
+
+    @property
+    def journal_ids(self):
+        return [part.job_id for part in self.parts]
+
+    @property
+    def errors(self):
+        return [f"{label}: {fehler}" for label, part in zip(self.labels, self.parts) for fehler in part.errors]
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_JOB_STATUS
+
+    @property
+    def progress(self):
+        if not self.total:
+            return 1.0
+        return min(1.0, (self.resumed_count + self.processed_count + self.error_count) / self.total)
+
+    def run(self, client, assistant_id, governor=None, score_cache=None):
+        """Bewertet alle Teile gleichzeitig über einen gemeinsamen Worker-Pool."""
+        max_workers = self.settings["max_workers"]
+        for part in self.parts:
+            part.status, part.started_at = JOB_RUNNING, time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            # Ein leichter Thread pro Teil sammelt nur die Ergebnisse ein, bewertet wird im gemeinsamen Pool
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(self.parts)) as collectors:
+                futures = {
+                    collectors.submit(run_job, part, client, assistant_id, governor=governor, score_cache=score_cache, executor=executor, grouping=self.grouping): part
+                    for part in self.parts
+                }
+                for fertig, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    part = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        part.status = JOB_FAILED
+                        part.message = f"Job abgebrochen: {str(e)}"
+                    part.finished_at = time.time()
+                    self.message = f"{fertig}/{len(self.parts)} {self.part_name} abgeschlossen"
+
+        failed = [(label, part) for label, part in zip(self.labels, self.parts) if part.status == JOB_FAILED]
+        if self.cancel_event.is_set():
+            self.status = JOB_CANCELLED
+        elif failed:
+            raise RuntimeError("; ".join(f"{label}: {part.message}" for label, part in failed))
+        else:
+            self.status = JOB_COMPLETED
+
+    def release(self):
+        for part in self.parts:
+            part.release()
+        self.grouping = None
+
+
+class WorkbookJob(CombinedJob):
+    """Mehrere Fragen einer Arbeitsmappe als ein Job, eine Frage pro Teil."""
+
+    part_name = "Fragen"
+
+    def __init__(self, owner, name, sheet_data, fragen):
+        """fragen ist eine Liste von (spalte, zeilen, journal) mit den Datenzeilen der Antworten."""
+        super().__init__(owner, [journal for _, _, journal in fragen], [journal.frage for _, _, journal in fragen])
+        self.name = name
+        # Originaldaten und Zeilenzuordnung für das Zurückschreiben der Ergebnisse
+        self.sheet_data = sheet_data
+        self.columns = [(spalte, zeilen) for spalte, zeilen, _ in fragen]
+
+    @property
+    def title(self):
+        return f"{self.name} ({len(self.parts)} Fragen)"
+
+    def fragen_results(self):
+        """(spalte, zeilen, codierungen) pro Frage für workbook.build_workbook_results."""
+        return [(spalte, zeilen, part.results()[1]) for (spalte, zeilen), part in zip(self.columns, self.parts)]
+
+
+class ExperimentJob(CombinedJob):
+    """Dieselben Antworten unter mehreren Prompt-Varianten, eine Variante pro Teil.
+
+    Jede Variante bringt ihre Anweisungen in den Einstellungen mit (system_prompt bzw.
+    run_instructions für die Runs des Assistants); der gemeinsame Assistant wird nicht
+    verändert, und jede Variante bewertet in eigenen Assistants-Threads. Alle Varianten
+    teilen sich die Antwortliste, deren einmalige Deduplizierung und den Worker-Pool; jede
+    eindeutige Antwort wird pro Variante genau einmal bewertet.
+    """
+
+    part_name = "Varianten"
+
+    def __init__(self, owner, varianten):
+        """varianten ist eine Liste von (name, journal); alle Journale enthalten dieselben Antworten."""
+        super().__init__(owner, [journal for _, journal in varianten], [name for name, _ in varianten])
+        self.grouping = group_for_settings(self.antworten, self.settings)
+
+    @property
+    def title(self):
+        return f"Experiment: {self.parts[0].title} ({len(self.parts)} Varianten)"
+
+    @property
+    def antworten(self):
+        return self.parts[0].results()[0]
+
+    def variant_results(self):
+        """(name, codierungen) pro Variante für score_stats.variant_table und variant_summary."""
+        return [(label, part.results()[1]) for label, part in zip(self.labels, self.parts)]
+
+
+def scoring_instructions(settings):
+    """Anweisungen und Modell, mit denen ein Job bewertet wird (gehen in den Cache-Schlüssel ein).
+
+    Das Assistants-Backend bewertet mit den gespeicherten Anweisungen des Assistants oder,
+    falls gesetzt, mit run_instructions, die jeder Run mitbringt (z.B. in Experimenten).
+    Die anderen Backends verwenden den System Prompt aus den Einstellungen.
+    """
+    if settings["backend"] == BACKEND_ASSISTANTS:
+        return settings.get("run_instructions") or settings["assistant_instructions"], settings["assistant_model"]
+    return settings["system_prompt"], settings["model"]
+
+
+def group_for_settings(antworten, settings):
+    """Fasst gleiche Antworten zusammen, wenn die Einstellungen das vorsehen; Rückgabe wie scoring.group_antworten."""
+    if settings["deduplicate"]:
+        return group_antworten(antworten)
+    return list(antworten), [[position] for position in range(len(antworten))]
+
+
+def score_unique_antworten(client, assistant_id, frage, eindeutige_antworten, settings, governor=None, score_cache=None, on_message=None, executor=None, journal=None, cancel_event=None):
+    """Bewertet eindeutige Antworten mit lokalen Regeln, Backend, Bündelung und Cache aus den Job-Einstellungen.
+
+    Liefert wie scoring.score_antworten Tupel (index, result, fehler) in der Reihenfolge
+    der Fertigstellung. on_message(text) erhält Statusmeldungen, z.B. zum Batch-Job.
+    executor ist ein optionaler gemeinsamer Worker-Pool für die Live-Backends. Mit journal
+    werden eingereichte Batch-Jobs dort vermerkt und beim Fortsetzen wieder aufgenommen.
+    cancel_event beendet das Warten auf einen Batch-Job und bricht ihn bei der API ab.
+    """
+    backend, system_prompt, model = settings["backend"], settings["system_prompt"], settings["model"]
+    pack_size, max_workers = settings["pack_size"], settings["max_workers"]
+    instructions, scoring_model = scoring_instructions(settings)
+    on_message = on_message or (lambda text: None)
+
+    def show_batch_status(batch, runde):
+        counts = batch.request_counts
+        on_message(
+            f"Batch-Job {batch.id} (Runde {runde}): {batch.status} | "
+            f"Erledigt: {counts.completed if counts else 0}/{counts.total if counts else 0} | "
+            f"Fehlgeschlagen: {counts.failed if counts else 0}"
+        )
+
+    def score_missing(indices):
+        """Bewertet die eindeutigen Antworten zu indices mit dem gewählten Backend."""
+        offene_antworten = [eindeutige_antworten[i] for i in indices]
+        if backend == BACKEND_BATCH:
+            if journal is not None and journal.batch is not None:
+                on_message(f"Nehme Batch-Job {journal.batch[0]} wieder auf...")
+            else:
+                on_message(f"Lade {len(indices)} Anfragen als Batch-Job hoch...")
+            return run_batch_job(
+                client, frage, offene_antworten, model, system_prompt, on_status=show_batch_status,
+                previous_batch=journal.batch if journal is not None else None,
+                on_submit=journal.record_batch if journal is not None else None,
+                cancel_event=cancel_event
+            )
+
+        on_message(f"Verarbeite {len(indices)} Antworten mit {max_workers} parallelen Anfragen...")
+        scorer = make_scorer(
+            client,
+            backend=backend,
+            assistant_id=assistant_id,
+            model=model,
+            instructions=instructions,
+            packed=pack_size > 1,
+            governor=governor,
+            run_instructions=settings.get("run_instructions")
+        )
+        return score_antworten(frage, offene_antworten, scorer, max_workers=max_workers, pack_size=pack_size, executor=executor)
+
+    def score_remote(indices):
+        """Bewertet die eindeutigen Antworten zu indices aus dem Cache oder mit dem Backend."""
+        if settings["use_cache"] and score_cache is not None:
+            offene_antworten = [eindeutige_antworten[i] for i in indices]
+            return score_with_cache(score_cache, instructions, scoring_model, frage, offene_antworten, lambda positions: score_missing([indices[p] for p in positions]))
+        return score_missing(indices)
+
+    if not eindeutige_antworten:
+        return iter(())
+    # Eindeutige Fälle (leer, Tastaturgeklimper, Sperrliste, ...) ohne API-Anfrage bewerten; ältere Journale ohne die Einstellung wie bisher
+    if settings.get("local_rules"):
+        rules = default_rules(settings.get("blocklist", DEFAULT_BLOCKLIST))
+        return score_locally(frage, eindeutige_antworten, rules, score_remote)
+    return score_remote(list(range(len(eindeutige_antworten))))
+
+
+def run_job(job, client, assistant_id, governor=None, score_cache=None, executor=None, grouping=None):
+    """Bewertet die offenen Antworten eines Jobs; bereits im Journal stehende Antworten werden übernommen.
+
+    Läuft ohne Streamlit im Hintergrund-Thread und schreibt Fortschritt und Ergebnisse
+    nur in das Job-Objekt und das Journal. grouping ist ein bereits berechnetes Ergebnis
+    von group_for_settings über alle Antworten des Jobs, z.B. einmal für alle Varianten
+    eines Experiments; es wird nur verwendet, solange noch keine Antwort im Journal steht.
+    """
+    journal, store = job.journal, job.store
+    frage, antworten = journal.frage, journal.antworten
+
+    # Bereits im Journal stehende Antworten übernehmen, nur der Rest wird bewertet
+    for index, codierung in journal.results.items():
+        store.record(index, codierung)
+    job.resumed_count = len(journal.results)
+
+    # Gleiche Antworten (auch mit abweichender Schreibweise) nur einmal bewerten
+    if grouping is not None and not journal.results:
+        eindeutige_antworten, gruppen = grouping
+        job.open_count = len(antworten)
+    else:
+        offene_indices = [index for index in range(job.total) if index not in journal.results]
+        offene_antworten = [antworten[index] for index in offene_indices]
+        eindeutige_antworten, gruppen = group_for_settings(offene_antworten, job.settings)
+        gruppen = [[offene_indices[position] for position in gruppe] for gruppe in gruppen]
+        job.open_count = len(offene_antworten)
+    job.unique_count = len(eindeutige_antworten)
+
+    def show_message(text):
+        job.message = text
+
+    results = score_unique_antworten(client, assistant_id, frage, eindeutige_antworten, job.settings, governor=governor, score_cache=score_cache, on_message=show_message, executor=executor, journal=journal, cancel_event=job.cancel_event)
+
+    try:
+        for unique_index, result, fehler in results:
+            # Ergebnis auf alle Nennungen der Gruppe übertragen und erfolgreiche Bewertungen sofort ins Journal schreiben
+            gruppe = gruppen[unique_index]
+            job.trace.record(job.job_id, gruppe[0], result, fehler)
+            for index in gruppe:
+                store.record(index, result["codierung"])
+                if fehler is None:
+                    journal.record(index, result["codierung"])
+            if fehler is None:
+                job.processed_count += len(gruppe)
+                if result.get("cached"):
+                    job.cache_hits += len(gruppe)
+                if result.get("local"):
+                    job.local_hits += len(gruppe)
+                if result["latency"] is not None:
+                    job.total_latency += result["latency"]
+                    job.latency_count += 1
+                job.request_count += result["requests"]
+                job.prompt_tokens += result["prompt_tokens"] or 0
+                job.completion_tokens += result["completion_tokens"] or 0
+            else:
+                if len(job.errors) < MAX_ERROR_MESSAGES:
+                    job.errors.append(f"Fehler bei der Verarbeitung von '{eindeutige_antworten[unique_index]}' ({len(gruppe)} Nennungen): {str(fehler)}")
+                job.error_count += len(gruppe)
+
+            if job.cancel_event.is_set():
+                break
+    finally:
+        # Abbruch: laufende Worker beenden, Bezahltes bleibt im Journal und im Cache
+        if hasattr(results, "close"):
+            results.close()
+        journal.close()
+
+    # Fehlgeschlagene oder abgebrochene Antworten bleiben offen, der Job kann dann später fortgesetzt werden
+    if job.cancel_event.is_set():
+        job.status = JOB_CANCELLED
+    else:
+        if job.error_count == 0:
+            journal.complete()
+        job.status = JOB_COMPLETED
+
+
+class JobManager:
+    """Führt Bewertungsjobs aller Sitzungen in einer festen Zahl von Hintergrund-Threads aus.
+
+    Wartende Jobs stehen in einer Warteschlange pro Nutzer. Ein frei werdender Platz geht
+    an den Nutzer mit den wenigsten laufenden Jobs, bei Gleichstand an den, dessen letzter
+    Job am längsten zurückliegt.
+    """
+
+    def __init__(self, client, assistant_id, governor=None, score_cache=None, max_concurrent_jobs=DEFAULT_MAX_CONCURRENT_JOBS):
+        self.client = client
+        self.assistant_id = assistant_id
+        self.governor = governor
+        self.score_cache = score_cache
+        self._condition = threading.Condition()
+        self._jobs = {}
+        self._queues = {}
+        self._running = collections.Counter()
+        self._last_started = {}
+        self._started_count = 0
+        for number in range(max_concurrent_jobs):
+            threading.Thread(target=self._work, name=f"scoring-job-{number}", daemon=True).start()
+
+    def submit(self, journal, owner):
+        """Reiht einen Job ein; ein bereits laufender Job mit derselben ID wird zurückgegeben."""
+        with self._condition:
+            existing = self._jobs.get(journal.job_id)
+            if existing is not None and not existing.finished:
+                return existing
+        return self.enqueue(ScoringJob(journal, owner))
+
+    def enqueue(self, job):
+        """Reiht einen fertig angelegten Job (ScoringJob oder WorkbookJob) ein."""
+        with self._condition:
+            self._prune()
+            self._jobs[job.job_id] = job
+            self._queues.setdefault(job.owner, collections.deque()).append(job)
+            self._condition.notify()
+            return job
+
+    def get(self, job_id):
+        with self._condition:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def jobs_for(self, owner):
+        """Alle bekannten Jobs eines Nutzers, der neueste zuerst."""
+        with self._condition:
+            self._prune()
+            jobs = [job for job in self._jobs.values() if job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created_at, reverse=True)
+
+    def active_job_ids(self):
+        """IDs der Journale aller wartenden oder laufenden Jobs."""
+        with self._condition:
+            return {journal_id for job in self._jobs.values() if not job.finished for journal_id in job.journal_ids}
+
+    def queue_position(self, job):
+        """Position eines wartenden Jobs in der Reihenfolge, in der die Plätze vergeben werden (ab 1)."""
+        with self._condition:
+            queues = {owner: list(queue) for owner, queue in self._queues.items()}
+            running = collections.Counter(self._running)
+            last_started = dict(self._last_started)
+        position = 0
+        while queues:
+            owner = _pick_owner(queues, running, last_started)
+            position += 1
+            if queues[owner].pop(0) is job:
+                return position
+            if not queues[owner]:
+                del queues[owner]
+            running[owner] += 1
+            last_started[owner] = position
+        return None
+
+    def cancel(self, job_id):
+        """Bricht einen Job ab; ein wartender Job wird sofort aus der Warteschlange genommen."""
+        with self._condition:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return
+            job.cancel_event.set()
+            queue = self._queues.get(job.owner)
+            if job.status == JOB_QUEUED and queue is not None and job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self._queues[job.owner]
+                job.status = JOB_CANCELLED
+                job.finished_at = time.time()
+                job.release()
+            else:
+                job.message = "Wird abgebrochen..."
+
+    def _prune(self):
+        cutoff = time.time() - FINISHED_JOB_RETENTION
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at is not None and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def _next_job(self):
+        owner = _pick_owner(self._queues, self._running, self._last_started)
+        queue = self._queues[owner]
+        job = queue.popleft()
+        if not queue:
+            del self._queues[owner]
+        self._running[owner] += 1
+        self._started_count += 1
+        self._last_started[owner] = self._started_count
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        job.message = "Wird gestartet..."
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queues:
+                    # Auch ohne neue Jobs regelmäßig aufräumen
+                    if not self._condition.wait(timeout=FINISHED_JOB_RETENTION):
+                        self._prune()
+                job = self._next_job()
+            try:
+                job.run(self.client, self.assistant_id, governor=self.governor, score_cache=self.score_cache)
+            except Exception as e:
+                job.status = JOB_FAILED
+                job.message = f"Job abgebrochen: {str(e)}"
+            finally:
+                job.finished_at = time.time()
+                job.trace.close()
+                # Ergebnisse stehen im Journal, die Sitzung übernimmt sie von dort
+                job.release()
+                with self._condition:
+                    self._running[job.owner] -= 1
+
+
+def _pick_owner(queues, running, last_started):
+    """Nutzer mit wartenden Jobs, der als Nächstes einen Platz bekommt."""
+    return min(queues, key=lambda owner: (running[owner], last_started.get(owner, 0)))
@@ -0,0 +1,191 @@
+"""Lokale Regeln, die eindeutige Fälle ohne API-Anfrage bewerten.
+
+Leere Antworten, reine Zahlen oder Satzzeichen, Tastaturgeklimper ("asdfgh"),
+Zeichenwiederholungen, Antworten in einer anderen Schrift als die Frage und Einträge
+der Sperrliste bekommen laut System Prompt ohnehin überall 0 Punkte. Die Regeln
+erkennen nur solche klaren Fälle, alles Zweifelhafte geht weiter an das Modell. Fragt
+die Frage nach einer Zahl ("Wie viele ...?", "Auf einer Skala von 1 bis 10 ..."), sind
+kurze Antworten und reine Zahlen gültig und gehen ebenfalls an das Modell.
+
+Eine Regel ist eine Funktion rule(frage, antwort), die einen Grund (str) oder None
+zurückgibt; default_rules() liefert die Standardregeln, eigene lassen sich ergänzen.
+Lokale Codierungen haben dieselbe Syntax wie die des Modells und tragen LOCAL_MARKER.
+"""
+import collections
+import math
+import re
+import unicodedata
+
+from scoring import normalize_antwort
+
+# Kennzeichnung lokal bewerteter Codierungen, z.B. "... Gesamt: 0 [lokal bewertet: nur Ziffern]"
+LOCAL_MARKER = "lokal bewertet"
+
+# Codierung für alle lokal erkannten Fälle in der Antwortsyntax des System Prompts
+LOCAL_CODIERUNG = "Relevanz: 0; Klarheit: 0; Detailgrad: 0; Grammatik und Stil: 0; Sprache: 0; Gesamt: 0"
+
+# Antworten, die unabhängig von der Frage nichts aussagen; verglichen wird normalisiert.
+# Mehrdeutige Kürzel wie "ka" (auch Karlsruhe) oder "test" (auch die Zeitschrift) fehlen bewusst
+DEFAULT_BLOCKLIST = ["k.A.", "keine Angabe", "keine Ahnung", "weiß nicht", "weiss nicht", "asdf", "xxx"]
+
+# Weniger Buchstaben und Ziffern gelten als leere Antwort
+MIN_LENGTH = 2
+
+# Entropie in Bit pro Zeichen, unter der eine Antwort ab ENTROPY_MIN_LENGTH Zeichen
+# als Wiederholung gilt ("hahahaha" hat 1 Bit, "Ananas" knapp 1,5 Bit)
+MAX_LOW_ENTROPY = 1.25
+ENTROPY_MIN_LENGTH = 6
+
+# Anteil der Zeichen, die ihrem Vorgänger gleichen ("aaaaaa"; "Pizzaaaaaa" bleibt darunter)
+MAX_REPEAT_RATIO = 0.7
+REPEAT_MIN_LENGTH = 4
+
+# Anteil benachbarter Tasten unter den Buchstabenpaaren, ab dem Tastaturgeklimper vorliegt
+# ("Werte" hat mit we, er, rt schon 3 von 4 Paaren, deshalb erst ab KEYBOARD_MIN_PAIRS)
+MAX_KEYBOARD_RATIO = 0.8
+KEYBOARD_MIN_PAIRS = 5
+
+# Tastenreihen der deutschen und der englischen Tastatur
+KEYBOARD_ROWS = ["qwertzuiopü", "asdfghjklöä", "yxcvbnm", "qwertyuiop", "zxcvbnm"]
+KEYBOARD_NEIGHBOURS = {pair for row in KEYBOARD_ROWS for a, b in zip(row, row[1:]) for pair in (a + b, b + a)}
+
+# Mindestanzahl Buchstaben in Frage und Antwort für den Vergleich der Schrift
+SCRIPT_MIN_LETTERS = 3
+
+# Fragen nach einer Zahl, bei denen kurze Antworten und reine Zahlen gültig sind
+NUMBER_QUESTION_PATTERN = re.compile(
+    r"\b(wie\s*viel\w*|wie (oft|alt|lange|hoch|groß|gross|teuer|weit)|anzahl|zahl|jahr\w*|alter|prozent\w*|"
+    r"skala|note|punkte?|how (many|much|often|old|long)|number|age|year|percent\w*|scale|rating)\b"
+    r"|\d+\s*(bis|-|–|to)\s*\d+",
+    re.IGNORECASE
+)
+
+
+def _zeichen(antwort):
+    """Buchstaben und Ziffern der Antwort in Kleinschreibung, ohne Leerraum und Satzzeichen."""
+    return [zeichen for zeichen in unicodedata.normalize("NFKC", antwort).casefold() if zeichen.isalnum()]
+
+
+def _script(text):
+    """Überwiegende Schrift der Buchstaben (z.B. LATIN, CYRILLIC, CJK) oder None bei zu wenigen Buchstaben."""
+    schriften = collections.Counter(unicodedata.name(zeichen, "").split(" ")[0] for zeichen in text if zeichen.isalpha())
+    if sum(schriften.values()) < SCRIPT_MIN_LETTERS:
+        return None
+    return schriften.most_common(1)[0][0]
+
+
+def asks_for_number(frage):
+    """True, wenn die Frage eine Zahl als Antwort erwartet (Anzahl, Alter, Jahr, Skala, ...)."""
+    return bool(NUMBER_QUESTION_PATTERN.search(frage))
+
+
+def _zahl_erwartet(frage, zeichen):
+    # Zahlen wie "1000000" sind bei Fragen nach einer Zahl gültig, auch wenn sich Ziffern wiederholen
+    return asks_for_number(frage) and all(z.isdigit() for z in zeichen)
+
+
+def too_short(frage, antwort):
+    zeichen = _zeichen(antwort)
+    # Bei Fragen nach einer Zahl ist "5" eine vollständige Antwort, nur leere Antworten sind eindeutig
+    if len(zeichen) < (1 if asks_for_number(frage) else MIN_LENGTH):
+        return "leer oder zu kurz"
+    return None
+
+
+def only_digits(frage, antwort):
+    if not asks_for_number(frage) and all(zeichen.isdigit() for zeichen in _zeichen(antwort)):
+        return "nur Ziffern"
+    return None
+
+
+def keyboard_mash(frage, antwort):
+    paare = [a + b for wort in antwort.casefold().split() for a, b in zip(wort, wort[1:]) if a.isalpha() and b.isalpha()]
+    if len(paare) >= KEYBOARD_MIN_PAIRS and sum(paar in KEYBOARD_NEIGHBOURS for paar in paare) / len(paare) >= MAX_KEYBOARD_RATIO:
+        return "Tastaturmuster"
+    return None
+
+
+def low_entropy(frage, antwort):
+    zeichen = _zeichen(antwort)
+    if len(zeichen) < ENTROPY_MIN_LENGTH or _zahl_erwartet(frage, zeichen):
+        return None
+    entropie = -sum(anzahl / len(zeichen) * math.log2(anzahl / len(zeichen)) for anzahl in collections.Counter(zeichen).values())
+    if entropie < MAX_LOW_ENTROPY:
+        return "geringe Zeichenvielfalt"
+    return None
+
+
+def repeated_characters(frage, antwort):
+    zeichen = _zeichen(antwort)
+    if len(zeichen) < REPEAT_MIN_LENGTH or _zahl_erwartet(frage, zeichen):
+        return None
+    if sum(a == b for a, b in zip(zeichen, zeichen[1:])) / len(zeichen) >= MAX_REPEAT_RATIO:
+        return "Zeichenwiederholung"
+    return None
+
+
+def script_mismatch(frage, antwort):
+    """Nur eine andere Schrift ist eindeutig; eine andere Sprache in derselben Schrift beurteilt das Modell."""
+    frage_schrift, antwort_schrift = _script(frage), _script(antwort)
+    if frage_schrift and antwort_schrift and frage_schrift != antwort_schrift:
+        return "andere Schrift als die Frage"
+    return None
+
+
+def blocklist_rule(blocklist):
+    """Regel für eine Sperrliste; Einträge und Antworten werden wie bei der Deduplizierung normalisiert."""
+    eintraege = {normalize_antwort(eintrag) for eintrag in blocklist}
+
+    def on_blocklist(frage, antwort):
+        if normalize_antwort(antwort) in eintraege:
+            return "Sperrliste"
+        return None
+    return on_blocklist
+
+
+def default_rules(blocklist=DEFAULT_BLOCKLIST):
+    """Standardregeln in der Reihenfolge, in der sie geprüft werden."""
+    return [too_short, only_digits, blocklist_rule(blocklist), keyboard_mash, low_entropy, repeated_characters, script_mismatch]
+
+
+def classify_antwort(frage, antwort, rules):
+    """Grund der ersten zutreffenden Regel oder None, wenn die Antwort an das Modell geht."""
+    for rule in rules:
+        grund = rule(frage, antwort)
+        if grund:
+            return grund
+    return None
+
+
+def local_result(grund):
+    """Ergebnis-Dict für eine lokal bewertete Antwort, ohne Anfragen und Token-Verbrauch."""
+    return {
+        "codierung": f"{LOCAL_CODIERUNG} [{LOCAL_MARKER}: {grund}]",
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "requests": 0,
+        "latency": None,
+        "status": "local",
+        "local": True,
+    }
+
+
+def score_locally(frage, antworten, rules, score_rest):
+    """Liefert lokal erkannte Fälle sofort und reicht nur die übrigen Antworten weiter.
+
+    score_rest(indices) muss wie score_missing bei score_cache.score_with_cache Tupel
+    (position, result, fehler) liefern, wobei sich position auf die Liste indices bezieht. Liefert Tupel
+    (index, result, fehler) bezogen auf antworten; lokale Ergebnisse sind an
+    result["local"] erkennbar.
+    """
+    rest = []
+    for index, antwort in enumerate(antworten):
+        grund = classify_antwort(frage, antwort, rules)
+        if grund:
+            yield index, local_result(grund), None
+        else:
+            rest.append(index)
+
+    if rest:
+        for position, result, fehler in score_rest(rest):
+            yield rest[position], result, fehler
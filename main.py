@@ -1,11 +1,24 @@
 import streamlit as st
 import pandas as pd
 import requests
-import io
+import math
+import os
 from openai import OpenAI
 import time
-import concurrent.futures
-import traceback
+from batch_scoring import BACKEND_BATCH
+from export import CSV_MIME, PARQUET_MIME, XLSX_MIME, csv_bytes, parquet_bytes, xlsx_bytes
+from job_journal import DEFAULT_JOURNAL_DIR, JOURNAL_RETENTION_DAYS, JobJournal, list_unfinished_jobs, load_job_results
+from job_manager import DEFAULT_MAX_CONCURRENT_JOBS, JOB_CANCELLED, JOB_COMPLETED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, ExperimentJob, JobManager, ScoringJob, WorkbookJob, scoring_instructions
+from local_rules import DEFAULT_BLOCKLIST
+from memory_report import session_memory
+from prompt_store import prompt_text, register_prompt, registered_prompts, shared_prompt
+from rate_limit import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, RateGovernor
+from result_store import ResultTable
+from score_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_DAYS, ScoreCache, prompt_hash
+from score_stats import PARSE_FLAG_COLUMN, parse_codierungen, variant_summary, variant_table
+from scoring import BACKEND_ASSISTANTS, BACKEND_CHAT, DEFAULT_MAX_WORKERS, DEFAULT_PACK_SIZE, DEFAULT_SYSTEM_PROMPT
+from telemetry import TRACE_FIELDS
+from workbook import build_workbook_results, column_answers, list_sheets, read_sheet
 
 # Seitenkonfiguration
 st.set_page_config(
@@ -33,7 +46,57 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # OpenAI Client initialisieren
-client = OpenAI(api_key=st.secrets["openai"]["api_key"])
+@st.cache_resource
+def get_client():
+    """Ein Client für den ganzen Prozess, damit Reruns und Sitzungen dessen Verbindungspool teilen.
+
+    Mit [openai] base_url kann ein lokaler Ersatz-Server verwendet werden (siehe tools/mock_openai_server.py).
+    """
+    return OpenAI(api_key=st.secrets["openai"]["api_key"], base_url=st.secrets["openai"].get("base_url"))
+
+client = get_client()
+
+# Anzeigenamen der Scoring-Backends
+BACKEND_LABELS = {
+    BACKEND_ASSISTANTS: "Assistants API (Thread)",
+    BACKEND_CHAT: "Chat Completions (zustandslos)",
+    BACKEND_BATCH: "Batch-Job (offline, günstig)",
+}
+
+# Anzeigenamen der Job-Status
+JOB_STATUS_LABELS = {
+    JOB_QUEUED: "⏳ wartet",
+    JOB_RUNNING: "▶️ läuft",
+    JOB_COMPLETED: "✅ fertig",
+    JOB_CANCELLED: "⏹️ abgebrochen",
+    JOB_FAILED: "❌ fehlgeschlagen",
+}
+
+# Abstand in Sekunden, in dem die Oberfläche den Status laufender Jobs abfragt
+JOB_POLL_INTERVAL = 2
+
+# Zeilen pro Seite in der Telemetrie-Ansicht
+TRACE_PAGE_SIZE = 50
+
+# Zeilen pro Seite in der Ergebnistabelle und in den Zwischenergebnissen laufender Jobs
+RESULT_PAGE_SIZE = 200
+LIVE_PAGE_SIZE = 50
+
+# Sekunden, die Modell und Anweisungen des Assistants zwischengespeichert werden
+ASSISTANT_CACHE_TTL = 300
+
+# Namen der Prompt-Varianten im Experiment; die Anzahl begrenzt zugleich die Varianten pro Job
+PROMPT_VARIANT_NAMES = ["A", "B", "C", "D"]
+
+# Funktion zum Abrufen von Modell und Anweisungen des Assistants
+@st.cache_data(ttl=ASSISTANT_CACHE_TTL, show_spinner=False)
+def get_assistant_info(assistant_id):
+    """Fragt den Assistant höchstens alle ASSISTANT_CACHE_TTL Sekunden ab statt bei jedem Rerun.
+
+    update_assistant leert den Cache, damit neue Anweisungen sofort in allen Sitzungen gelten.
+    """
+    assistant = client.beta.assistants.retrieve(assistant_id=assistant_id)
+    return {"model": assistant.model, "instructions": assistant.instructions}
 
 # Anwendung initialisieren
 def initialize_app():
@@ -41,90 +104,48 @@ def initialize_app():
     try:
         # Überprüfen, ob der Assistant existiert
         assistant_id = st.secrets["assistant"]["id"]
-        assistant = client.beta.assistants.retrieve(assistant_id=assistant_id)
+        assistant = get_assistant_info(assistant_id)
         
-        # Überprüfen, ob ein Thread existiert, sonst einen neuen erstellen
-        if "thread_id" not in st.session_state:
-            thread = client.beta.threads.create()
-            st.session_state.thread_id = thread.id
+        # Modell des Assistants merken, das zustandslose Backend verwendet standardmäßig dasselbe
+        st.session_state.assistant_model = assistant["model"]
         
-        # Überprüfen, ob der Thread gültig ist
-        try:
-            client.beta.threads.retrieve(thread_id=st.session_state.thread_id)
-        except Exception:
-            # Thread ist ungültig, neuen erstellen
-            thread = client.beta.threads.create()
-            st.session_state.thread_id = thread.id
+        # Aktuelle Anweisungen des Assistants merken, sie gehen in den Cache-Schlüssel ein;
+        # alle Sitzungen teilen sich dabei eine Instanz des Textes
+        st.session_state.assistant_instructions = shared_prompt(assistant["instructions"])
+        
+        # Threads werden erst beim Start einer Bewertung pro Worker angelegt (siehe scoring.get_worker_thread_id)
         
         return True
     except Exception as e:
         st.error(f"Fehler bei der Initialisierung: {str(e)}")
         return False
 
-# Funktion zur Analyse einer Frage mit OpenAI Assistants API
-def analyze_question(frage, antwort, max_retries=3, retry_delay=2):
-    # Debug-Information in session_state speichern
-    if "debug_info" not in st.session_state:
-        st.session_state.debug_info = []
-    
-    message_content = f"Zu bewertende Frage: {frage}. Zu bewertende Antwort: {antwort}"
-    st.session_state.debug_info.append({"message": message_content, "system_prompt": system_prompt})
-    
-    # Wiederholungsversuche implementieren
-    for attempt in range(max_retries):
-        try:
-            # Verwende den spezifischen Assistant aus den Secrets
-            assistant_id = st.secrets["assistant"]["id"]
-            
-            # Wenn kein Thread existiert, erstelle einen neuen
-            if "thread_id" not in st.session_state:
-                thread = client.beta.threads.create()
-                st.session_state.thread_id = thread.id
-            
-            # Nachricht zum Thread hinzufügen
-            client.beta.threads.messages.create(
-                thread_id=st.session_state.thread_id,
-                role="user",
-                content=message_content
-            )
-            
-            # Run erstellen und auf Abschluss warten
-            run = client.beta.threads.runs.create_and_poll(
-                thread_id=st.session_state.thread_id,
-                assistant_id=assistant_id
-            )
-            
-            if run.status == 'completed':
-                # Antwort abrufen
-                messages = client.beta.threads.messages.list(
-                    thread_id=st.session_state.thread_id
-                )
-                
-                # Die neueste Assistenten-Nachricht zurückgeben
-                for message in messages.data:
-                    if message.role == "assistant":
-                        return message.content[0].text.value.strip()
-                
-                return "Keine Antwort vom Assistenten erhalten"
-            elif run.status == 'failed':
-                if attempt < max_retries - 1:  # Wenn nicht der letzte Versuch
-                    time.sleep(retry_delay)  # Warte vor dem nächsten Versuch
-                    continue
-                else:
-                    return f"Fehler nach {max_retries} Versuchen: Run-Status ist {run.status}"
-            else:
-                return f"Unerwarteter Run-Status: {run.status}"
-                
-        except Exception as e:
-            error_details = traceback.format_exc()
-            if attempt < max_retries - 1:  # Wenn nicht der letzte Versuch
-                time.sleep(retry_delay)  # Warte vor dem nächsten Versuch
-                continue
-            else:
-                return f"Fehler nach {max_retries} Versuchen: {str(e)}"
-    
-    # Sollte nie hierher kommen, aber als Fallback
-    return "Fehler: Analyse konnte nicht durchgeführt werden"
+# Funktion zum Öffnen des Bewertungs-Caches
+def get_score_cache():
+    """Öffnet den persistenten Bewertungs-Cache mit den Einstellungen aus [cache] in den Secrets."""
+    cache_config = st.secrets.get("cache", {})
+    return ScoreCache(
+        path=cache_config.get("path", DEFAULT_CACHE_PATH),
+        ttl_days=cache_config.get("ttl_days", DEFAULT_TTL_DAYS),
+        max_entries=cache_config.get("max_entries", DEFAULT_MAX_ENTRIES)
+    )
+
+# Funktion zum Abrufen des Job-Managers
+@st.cache_resource
+def get_job_manager():
+    """Ein Job-Manager für den ganzen Prozess; alle Sitzungen teilen sich Warteschlange und Rate-Governor."""
+    jobs_config = st.secrets.get("jobs", {})
+    governor = RateGovernor(
+        requests_per_minute=jobs_config.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE),
+        tokens_per_minute=jobs_config.get("tokens_per_minute", DEFAULT_TOKENS_PER_MINUTE)
+    )
+    return JobManager(
+        client,
+        st.secrets["assistant"]["id"],
+        governor=governor,
+        score_cache=get_score_cache(),
+        max_concurrent_jobs=jobs_config.get("max_concurrent_jobs", DEFAULT_MAX_CONCURRENT_JOBS)
+    )
 
 # Funktion zum Aktualisieren des Assistants
 def update_assistant(new_instructions):
@@ -137,33 +158,20 @@ def update_assistant(new_instructions):
             assistant_id=assistant_id,
             instructions=new_instructions
         )
+        
+        # Zwischengespeicherte Bewertungen mit den alten Anweisungen sind nicht mehr gültig
+        old_instructions = st.session_state.get("assistant_instructions")
+        if old_instructions is not None and old_instructions != new_instructions:
+            get_score_cache().invalidate_prompt(prompt_hash(old_instructions))
+        st.session_state.assistant_instructions = shared_prompt(new_instructions)
+        
+        # Zwischengespeicherte Assistant-Daten beim nächsten Rerun neu abrufen
+        get_assistant_info.clear()
+        
         st.success("Assistant wurde mit neuen Anweisungen aktualisiert.")
     except Exception as e:
         st.error(f"Fehler beim Aktualisieren des Assistants: {e}")
 
-# Funktion zum Bereinigen des Threads, wenn er zu groß wird
-def cleanup_thread_if_needed(max_messages=50):
-    """Erstellt einen neuen Thread, wenn der aktuelle zu viele Nachrichten enthält."""
-    if "thread_id" in st.session_state:
-        try:
-            # Anzahl der Nachrichten im aktuellen Thread abrufen
-            messages = client.beta.threads.messages.list(
-                thread_id=st.session_state.thread_id
-            )
-            
-            # Wenn zu viele Nachrichten, neuen Thread erstellen
-            if len(messages.data) > max_messages:
-                thread = client.beta.threads.create()
-                st.session_state.thread_id = thread.id
-                return True  # Thread wurde bereinigt
-        except Exception as e:
-            # Bei Fehler einfach einen neuen Thread erstellen
-            thread = client.beta.threads.create()
-            st.session_state.thread_id = thread.id
-            return True  # Thread wurde bereinigt
-    
-    return False  # Keine Bereinigung notwendig
-
 # Authentifizierung
 def check_password():
     """Returns `True` if the user had the correct password."""
@@ -182,6 +190,7 @@ def check_password():
             if st.session_state["username"] in st.secrets["users"]:
                 if st.session_state["password"] == st.secrets["users"][st.session_state["username"]]:
                     st.session_state["password_correct"] = True
+                    st.session_state["user"] = st.session_state["username"]  # Für die faire Verteilung der Jobs
                     del st.session_state["password"]  # Passwort aus Session State löschen
                     del st.session_state["username"]  # Username aus Session State löschen
                 else:
@@ -206,31 +215,58 @@ def check_password():
             return True
 
 # Funktion zum Speichern der Ergebnisse
-def save_results_to_session():
-    """Speichert die aktuellen Ergebnisse in der Session, um sie bei einem Neustart wiederherzustellen."""
-    if "results_df" in st.session_state and not st.session_state.results_df.empty:
-        # Speichere die Ergebnisse als CSV-String in der Session
-        csv_buffer = io.StringIO()
-        st.session_state.results_df.to_csv(csv_buffer, index=False)
-        st.session_state.saved_results_csv = csv_buffer.getvalue()
-        st.session_state.saved_results_timestamp = time.time()
+def save_results_to_session(job_id):
+    """Merkt sich, aus welchem Job die Ergebnisse stammen, um sie bei einem Neustart wiederherzustellen.
+
+    Das Journal des Jobs wird ohnehin Antwort für Antwort geschrieben und dient als
+    Checkpoint; die Session hält nur die Job-ID statt einer Kopie der Ergebnisse.
+    """
+    st.session_state.saved_results = {"job_id": job_id, "timestamp": time.time()}
 
 # Funktion zum Wiederherstellen der Ergebnisse
-def restore_results_from_session():
-    """Stellt die gespeicherten Ergebnisse aus der Session wieder her."""
-    if "saved_results_csv" in st.session_state:
+def restore_results_from_session(journal_dir):
+    """Stellt die gespeicherten Ergebnisse aus dem Journal des gemerkten Jobs wieder her."""
+    saved = st.session_state.get("saved_results")
+    if saved:
         try:
-            csv_buffer = io.StringIO(st.session_state.saved_results_csv)
-            restored_df = pd.read_csv(csv_buffer)
-            if not restored_df.empty:
-                st.session_state.results_df = restored_df
-                timestamp = st.session_state.saved_results_timestamp
-                time_str = time.strftime("%H:%M:%S", time.localtime(timestamp))
-                return f"Ergebnisse vom {time_str} Uhr wiederhergestellt."
+            antworten, codierungen = load_job_results(journal_dir, saved["job_id"])
+            st.session_state.results = ResultTable(antworten, codierungen)
+            time_str = time.strftime("%H:%M:%S", time.localtime(saved["timestamp"]))
+            return f"Ergebnisse vom {time_str} Uhr wiederhergestellt."
         except Exception as e:
             return f"Fehler beim Wiederherstellen der Ergebnisse: {str(e)}"
     return None
 
+# Funktion zur Auswahl einer Tabellenseite
+def page_selector(row_count, page_size, key):
+    """Seitenauswahl für große Tabellen; bei nur einer Seite wird kein Widget angezeigt.
+
+    Über key bleibt die gewählte Seite erhalten, während ein laufender Job neue Seiten
+    anhängt; liegt sie außerhalb einer kleineren neuen Tabelle, beginnt Streamlit wieder bei 1.
+    """
+    page_count = max(1, math.ceil(row_count / page_size))
+    if page_count == 1:
+        return 1
+    return st.number_input(f"Seite (von {page_count}):", min_value=1, max_value=page_count, value=1, key=key)
+
+# Funktion für zwischengespeicherte Exportdateien
+def cached_export(name, source, version, build):
+    """Gibt eine Funktion für st.download_button zurück, die die Datei erst beim Klick erzeugt.
+
+    Aufgehoben wird nur die zuletzt erzeugte Datei: wiederholte Klicks auf denselben
+    Download kosten nichts, ohne dass jede Sitzung alle Formate im Speicher hält. Die
+    Funktion läuft in einem eigenen Thread und greift deshalb nur auf das übergebene Dict zu.
+    """
+    export_cache = st.session_state.setdefault("export_cache", {})
+    
+    def data():
+        entry = export_cache.get("last")
+        if entry is None or entry[0] != name or entry[1] is not source or entry[2] != version:
+            entry = (name, source, version, build())
+            export_cache["last"] = entry
+        return entry[3]
+    return data
+
 # Hauptapp nur anzeigen, wenn Login erfolgreich
 if check_password():
     # App-Header
@@ -260,120 +296,184 @@ if check_password():
         st.success(f"✅ Assistant aktiv: {assistant_id}")
         
         # Thread-Status
-        if "thread_id" in st.session_state:
-            st.success(f"✅ Thread aktiv: {st.session_state.thread_id}")
-        else:
-            st.info("ℹ️ Ein Thread wird automatisch erstellt, wenn die erste Anfrage gestellt wird.")
+        st.info("ℹ️ Threads werden automatisch pro Worker erstellt, wenn eine Bewertung startet.")
+        
+        # Anweisungen des letzten Jobs einmal anzeigen, nicht pro Antwort
+        trace_instructions = prompt_text(st.session_state.get("trace_prompt_id"))
+        if trace_instructions:
+            st.subheader("Anweisungen des letzten Jobs")
+            st.code(trace_instructions, language="markdown")
         
-        # API-Anfragen anzeigen
-        if "debug_info" in st.session_state and st.session_state.debug_info:
-            st.subheader("Letzte API-Anfragen")
-            for idx, info in enumerate(st.session_state.debug_info):
-                st.markdown(f"**Anfrage {idx+1}:**")
-                st.json(info)
-                st.markdown("---")
+        # Speicherbedarf dieser Sitzung, abgelegte Prompts teilen sich alle Sitzungen
+        if st.button("📏 Speicherbedarf der Sitzung messen"):
+            memory = session_memory(st.session_state, shared=registered_prompts())
+            st.metric("Speicher dieser Sitzung", f"{sum(size for _, size in memory) / 2**20:.2f} MiB")
+            st.dataframe(
+                pd.DataFrame(memory, columns=["Eintrag", "Bytes"]),
+                use_container_width=True,
+                hide_index=True
+            )
 
     # Zwei Spalten für die Haupteingaben
     col1, col2 = st.columns([1, 1])
 
-    # Initialisierung des DataFrames in session_state
-    if "results_df" not in st.session_state:
-        st.session_state.results_df = pd.DataFrame(columns=["Antwort", "Codierung"])
+    # Verzeichnis und Aufbewahrungsfrist für die Job-Journale
+    journal_dir = st.secrets.get("jobs", {}).get("path", DEFAULT_JOURNAL_DIR)
+    journal_retention_days = st.secrets.get("jobs", {}).get("retention_days", JOURNAL_RETENTION_DAYS)
+
+    # Initialisierung der Ergebnisse in session_state
+    if "results" not in st.session_state:
+        st.session_state.results = ResultTable([], [])
         
         # Versuche, gespeicherte Ergebnisse wiederherzustellen
-        restore_message = restore_results_from_session()
+        restore_message = restore_results_from_session(journal_dir)
         if restore_message:
             st.success(restore_message)
 
-    # Funktion zur Verarbeitung der Nennungen
-    def process_nennungen():
-        # Debug-Info zurücksetzen
-        st.session_state.debug_info = []
+    # Prozessweiter Job-Manager und angemeldeter Nutzer
+    job_manager = get_job_manager()
+    current_user = st.session_state.get("user", "anonym")
+
+    # Funktion zum Einreihen eines Jobs
+    def submit_job(journal):
+        """Reiht einen Job beim Job-Manager ein; die Bewertung läuft im Hintergrund."""
+        # Das Assistants-Backend bewertet mit den aktuellen Anweisungen des Assistants, sie gehen in den Cache-Schlüssel ein
+        journal.settings.setdefault("assistant_instructions", st.session_state.assistant_instructions)
+        journal.settings.setdefault("assistant_model", st.session_state.assistant_model)
+        job = job_manager.submit(journal, current_user)
+        st.session_state.active_job_id = job.job_id
+        return job
+
+    # Funktion zum Einlesen eines Tabellenblatts
+    def load_sheet(uploaded_file, sheet):
+        """Liest ein Tabellenblatt der hochgeladenen Mappe einmal ein und hält es für weitere Reruns in der Session."""
+        key = (uploaded_file.file_id, sheet)
+        if st.session_state.get("sheet_data_key") != key:
+            st.session_state.sheet_data = read_sheet(uploaded_file, sheet)
+            st.session_state.sheet_data_key = key
+        return st.session_state.sheet_data
+
+    # Funktion zum Einreihen einer Arbeitsmappe
+    def submit_workbook_job(name, sheet_data, fragen, settings):
+        """Legt pro Frage ein Journal an und reiht alle Fragen als einen gemeinsamen Job ein."""
+        parts = []
+        for spalte, frage_text in fragen:
+            zeilen, antworten = column_answers(sheet_data, spalte)
+            if not antworten:
+                st.warning(f"Spalte '{spalte}' enthält keine Antworten und wird übersprungen.")
+                continue
+            workbook_settings = {**settings, "workbook": {"datei": name, "blatt": sheet_data.name, "spalte": spalte}}
+            parts.append((spalte, zeilen, JobJournal.create(journal_dir, frage_text, antworten, workbook_settings, owner=current_user)))
+        if parts:
+            job = job_manager.enqueue(WorkbookJob(current_user, name, sheet_data, parts))
+            st.session_state.active_job_id = job.job_id
+
+    # Funktion zum Einreihen eines Experiments mit mehreren Prompt-Varianten
+    def submit_experiment_job(frage, antworten, varianten, settings):
+        """Legt pro Prompt-Variante ein Journal an und reiht alle Varianten als einen gemeinsamen Job ein."""
+        parts = []
+        for name, prompt in varianten:
+            # Jeder Run bringt die Anweisungen seiner Variante mit, der gemeinsame Assistant bleibt unverändert
+            variant_settings = {**settings, "system_prompt": prompt, "run_instructions": prompt, "experiment": {"variante": name}}
+            parts.append((name, JobJournal.create(journal_dir, frage, antworten, variant_settings, owner=current_user)))
+        job = job_manager.enqueue(ExperimentJob(current_user, parts))
+        st.session_state.active_job_id = job.job_id
+
+    # Funktion zum Übernehmen der Ergebnisse eines beendeten Jobs
+    def adopt_job_results(job):
+        """Übernimmt Ergebnisse, Debug-Informationen und Kennzahlen eines beendeten Jobs in die Sitzung."""
+        if isinstance(job, WorkbookJob):
+            # Ergebnisse der Arbeitsmappe einmal aufbereiten, nicht bei jedem Rerun
+            st.session_state.workbook_results = build_workbook_results(job.sheet_data, job.fragen_results())
+            st.session_state.workbook_sheet = job.sheet_data.name
+            st.session_state.workbook_name = job.name
+        elif isinstance(job, ExperimentJob):
+            # Vergleichstabelle und Statistik der Varianten einmal aufbereiten
+            variant_results = job.variant_results()
+            st.session_state.experiment_results = variant_table(job.antworten, variant_results)
+            st.session_state.experiment_summary = variant_summary(variant_results)
+        else:
+            # Nur die kompakte Tabelle übernehmen; der beendete Job hält keine Listen mehr, gelesen wird das Journal
+            st.session_state.results = ResultTable(*job.results())
+            save_results_to_session(job.job_id)
+        st.session_state.call_trace = job.trace
+        st.session_state.trace_prompt_id = register_prompt(scoring_instructions(job.settings)[0])
+        st.session_state.job_summary = job_summary_messages(job)
+        st.session_state.active_job_id = None
+
+    # Funktion zum Zusammenfassen eines Jobs
+    def job_summary_messages(job):
+        """Meldungen (Art, Text) zum Abschluss eines Jobs."""
+        messages = [("error", fehler) for fehler in job.errors]
+        if job.error_count > len(job.errors):
+            messages.append(("error", f"... und weitere Fehler, insgesamt {job.error_count} Nennungen."))
         
-        antworten = [a.strip() for a in nennungen.splitlines() if a.strip()]
-        total_antworten = len(antworten)
+        erfolgreich = job.resumed_count + job.processed_count
+        if job.status == JOB_CANCELLED:
+            messages.append(("warning", f"⏹️ Job {job.job_id} wurde abgebrochen. {erfolgreich} von {job.total} Antworten sind bewertet, der Job kann fortgesetzt werden."))
+        elif job.status != JOB_COMPLETED:
+            messages.append(("error", f"Job {job.job_id}: {job.message}"))
+        elif job.error_count > 0:
+            # Fehlgeschlagene Antworten bleiben offen, der Job kann dann später fortgesetzt werden
+            messages.append(("warning", f"✅ Analyse abgeschlossen mit {job.error_count} Fehlern. {erfolgreich} von {job.total} Antworten erfolgreich verarbeitet. "
+                                        f"Job {job.job_id} kann fortgesetzt werden, um die fehlgeschlagenen Antworten erneut zu bewerten."))
+        else:
+            messages.append(("success", f"✅ Analyse erfolgreich abgeschlossen! Alle {job.total} Antworten wurden verarbeitet."))
         
-        if total_antworten == 0:
-            st.error("Keine gültigen Antworten gefunden.")
+        # Kennzahlen pro Antwort, um die Backends direkt vergleichen zu können
+        if job.processed_count > 0:
+            latency_text = f"Ø Latenz pro Antwort: {job.total_latency / job.latency_count:.2f} s | " if job.latency_count else ""
+            cache_text = f"Cache-Treffer: {job.cache_hits}/{job.total} ({job.cache_hits / job.total:.0%}) | " if job.settings["use_cache"] else ""
+            local_text = f"Lokal bewertet: {job.local_hits}/{job.total} ({job.local_hits / job.total:.0%}) | " if job.settings.get("local_rules") else ""
+            messages.append(("info",
+                f"Backend: {BACKEND_LABELS[job.settings['backend']]} | "
+                f"Eindeutige Antworten: {job.unique_count}/{job.open_count} | "
+                f"{local_text}"
+                f"{cache_text}"
+                f"Modell-Anfragen: {job.request_count:.0f} | "
+                f"{latency_text}"
+                f"Ø Tokens pro Antwort: {job.prompt_tokens / job.processed_count:.0f} Prompt / {job.completion_tokens / job.processed_count:.0f} Completion"
+            ))
+        return messages
+
+    # Funktion zur Anzeige der Zwischenergebnisse eines laufenden Jobs
+    def show_live_results(job, store):
+        """Zeigt die bisher bewerteten Antworten seitenweise, die neuesten zuerst.
+
+        Pro Abfrage wird nur die angezeigte Seite aus dem Ergebnisspeicher gelesen und geparst,
+        der Aufwand wächst damit nicht mit der Anzahl der Antworten.
+        """
+        with st.expander(f"Zwischenergebnisse ({store.completed_count} von {job.total})", expanded=True):
+            page = page_selector(store.completed_count, LIVE_PAGE_SIZE, key=f"live_page_{job.job_id}")
+            rows = store.recent(page, LIVE_PAGE_SIZE)
+            st.dataframe(pd.concat([rows, parse_codierungen(rows["Codierung"])], axis=1), use_container_width=True, hide_index=True)
+
+    # Funktion zur Anzeige des aktuellen Jobs
+    @st.fragment(run_every=JOB_POLL_INTERVAL)
+    def show_job_status():
+        """Zeigt den Fortschritt des aktuellen Jobs und aktualisiert sich selbst, bis der Job beendet ist."""
+        job = job_manager.get(st.session_state.get("active_job_id"))
+        if job is None:
+            st.session_state.active_job_id = None
             return
+        if job.finished:
+            adopt_job_results(job)
+            st.rerun()
         
-        # Fortschrittsanzeige
-        progress_text = st.empty()
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        
-        # DataFrame zurücksetzen
-        st.session_state.results_df = pd.DataFrame(columns=["Antwort", "Codierung"])
-        
-        # Batch-Größe festlegen (kleinere Batches für bessere Fortschrittsanzeige)
-        batch_size = min(10, total_antworten)
-        
-        # Antworten in Batches verarbeiten
-        processed_count = 0
-        error_count = 0
-        
-        # Zähler für Thread-Bereinigung
-        messages_processed = 0
-        
-        # Zähler für regelmäßiges Speichern
-        last_save_count = 0
-        
-        for i in range(0, total_antworten, batch_size):
-            batch = antworten[i:i+batch_size]
-            batch_results = []
-            
-            progress_text.text(f"Verarbeite Antworten {i+1} bis {min(i+batch_size, total_antworten)} von {total_antworten}...")
-            
-            # Thread bereinigen, wenn zu viele Nachrichten verarbeitet wurden
-            if messages_processed >= 40:  # Bereinigen nach 40 Nachrichten
-                if cleanup_thread_if_needed():
-                    status_text.info("Thread wurde bereinigt, um Stabilität zu gewährleisten.")
-                    messages_processed = 0
-            
-            # Jede Antwort im Batch verarbeiten
-            for antwort in batch:
-                try:
-                    with st.spinner(f'Analysiere Antwort: "{antwort[:30]}..."' if len(antwort) > 30 else f'Analysiere Antwort: "{antwort}"'):
-                        codierung = analyze_question(frage, antwort)
-                        batch_results.append({"Antwort": antwort, "Codierung": codierung})
-                        processed_count += 1
-                        messages_processed += 1  # Zähler erhöhen
-                except Exception as e:
-                    error_details = traceback.format_exc()
-                    st.error(f"Fehler bei der Verarbeitung von '{antwort}': {str(e)}")
-                    batch_results.append({"Antwort": antwort, "Codierung": f"FEHLER: {str(e)}"})
-                    error_count += 1
-                
-                # Fortschrittsbalken aktualisieren
-                progress = processed_count / total_antworten
-                progress_bar.progress(progress)
-                status_text.text(f"Verarbeitet: {processed_count}/{total_antworten} | Fehler: {error_count}")
-            
-            # Batch-Ergebnisse zum DataFrame hinzufügen
-            batch_df = pd.DataFrame(batch_results)
-            st.session_state.results_df = pd.concat([st.session_state.results_df, batch_df], ignore_index=True)
-            
-            # Regelmäßiges Speichern der Ergebnisse (alle 20 verarbeiteten Antworten)
-            if processed_count - last_save_count >= 20:
-                save_results_to_session()
-                last_save_count = processed_count
-                status_text.text(f"Verarbeitet: {processed_count}/{total_antworten} | Fehler: {error_count} | Zwischenergebnisse gespeichert")
-            
-            # Kurze Pause zwischen den Batches, um API-Limits zu vermeiden
-            if i + batch_size < total_antworten:
-                time.sleep(0.5)
-        
-        # Abschluss
-        progress_bar.empty()
-        progress_text.empty()
-        
-        # Endgültiges Speichern der Ergebnisse
-        save_results_to_session()
-        
-        if error_count > 0:
-            status_text.warning(f"✅ Analyse abgeschlossen mit {error_count} Fehlern. {processed_count - error_count} von {total_antworten} Antworten erfolgreich verarbeitet.")
+        if job.status == JOB_QUEUED:
+            st.info(f"Job {job.job_id} wartet in der Warteschlange (Position {job_manager.queue_position(job)}).")
         else:
-            status_text.success(f"✅ Analyse erfolgreich abgeschlossen! Alle {total_antworten} Antworten wurden verarbeitet.")
+            if job.resumed_count:
+                st.info(f"Job {job.job_id} wird fortgesetzt: {job.resumed_count} von {job.total} Antworten sind bereits bewertet.")
+            st.text(job.message)
+            st.progress(job.progress)
+            st.text(f"Verarbeitet: {job.resumed_count + job.processed_count}/{job.total} | Fehler: {job.error_count}")
+            # Der Ergebnisspeicher wird freigegeben, sobald der Job endet
+            store = job.store if isinstance(job, ScoringJob) else None
+            if store is not None and store.completed_count:
+                show_live_results(job, store)
+        st.caption("Der Job läuft im Hintergrund weiter, auch wenn du die Seite verlässt.")
+        st.button("⏹️ Job abbrechen", key=f"cancel_{job.job_id}", on_click=job_manager.cancel, args=(job.job_id,), use_container_width=True)
 
     with col1:
         st.subheader("📝 Eingabebereich")
@@ -400,45 +500,7 @@ if check_password():
             
             system_prompt = st.text_area(
                 "🤖 KI-Anweisungen (System Prompt):",
-                value="""Als Sprachassistent bist du darauf spezialisiert, die Qualität von offenen Antworten in Onlineumfragen zu bewerten.
-
-**Eingabeformat**
-Du erhältst die Eingabe in folgendem Format:
-Frage: [Die gestellte Frage]
-Antwort: [Die zu bewertende Antwort]
-
-**Bewertungskriterien**
-
-1. **Relevanz**: 
-   - Bewertet die inhaltliche Passung zur Frage (0-100)
-   - Bei komplett irrelevanter Antwort = 0
-
-2. **Klarheit**: 
-   - Bewertet Verständlichkeit und Struktur (0-100)
-   - Auch bei irrelevanter Antwort die tatsächliche Klarheit bewerten
-
-3. **Detailgrad und Menschlichkeit**: 
-   - Bewertet Informationsgehalt und Vollständigkeit (0-100)
-    - Bewertungsrichtlinien:
-      *WICHTIG: Eine Einwortantwort ist oft besser als eine lange, ausschweifende Antwort
-      *Wenn eine kurze oder Einwortantwort relevant ist, dann sollte der Score 80-100 sein
-       *0 Punkte vergeben bei Lexikon-artigen Erklärungen
-
-4. **Grammatik und Stil**: 
-   - Bewertet sprachliche Korrektheit (0-100)
-   - Unabhängig von Relevanz oder Detailgrad bewerten
-
-5. **Sprache**:
-   - Wenn die Frage Frage und die Antwort auf verschieden Sprachen sind, z.B. Frage auf Deutsch und Antwort auf Englisch: 
-     * Sprache = 0, sonst 100
-     * Wenn Sprache = 0, dann setze alle Scores=0
-     * Bei Nonsense = 0
-
-**Gesamtwertung**:
-- Mathematischer Durchschnitt aller fünf Kriterien
-
-# Antwortsyntax (NUR DIESE ZEILE AUSGEBEN)
-Relevanz: [Zahl]; Klarheit: [Zahl]; Detailgrad: [Zahl]; Grammatik und Stil: [Zahl]; Sprache: [Zahl];Gesamt: [Zahl]""",
+                value=DEFAULT_SYSTEM_PROMPT,
                 height=400,
                 help="Experimentiere mit verschiedenen Anweisungen und beobachte, wie sich die Bewertungen ändern."
             )
@@ -448,6 +510,25 @@ Relevanz: [Zahl]; Klarheit: [Zahl]; Detailgrad: [Zahl]; Grammatik und Stil: [Zah
                 update_assistant(system_prompt)
             
             st.info("💡 Probiere verschiedene Varianten aus und vergleiche die Ergebnisse!")
+            
+            # Weitere Prompt-Varianten für den direkten Vergleich; Variante A ist der System Prompt oben
+            st.markdown("#### Prompt-Varianten vergleichen")
+            st.caption("Mit \"🧪 Varianten vergleichen\" werden dieselben Antworten mit jeder Variante bewertet. "
+                       "Jeder Run bringt seine Anweisungen selbst mit, der Assistant wird dabei nicht verändert.")
+            variant_count = st.number_input(
+                "Anzahl Varianten:",
+                min_value=2,
+                max_value=len(PROMPT_VARIANT_NAMES),
+                value=2
+            )
+            prompt_variants = [(PROMPT_VARIANT_NAMES[0], system_prompt)]
+            for name in PROMPT_VARIANT_NAMES[1:variant_count]:
+                prompt_variants.append((name, st.text_area(
+                    f"Variante {name}:",
+                    value=DEFAULT_SYSTEM_PROMPT,
+                    height=200,
+                    key=f"variant_prompt_{name}"
+                )))
         
         # Trennlinie zwischen Experiment- und Eingabebereich
         st.markdown("---")
@@ -482,8 +563,81 @@ Relevanz: [Zahl]; Klarheit: [Zahl]; Detailgrad: [Zahl]; Grammatik und Stil: [Zah
                 if num_entries > 0:
                     st.info(f"Anzahl der Nennungen: {num_entries}/2500")
 
+        # Auswahl des Scoring-Backends
+        backend = st.radio(
+            "Scoring-Backend:",
+            options=list(BACKEND_LABELS),
+            format_func=BACKEND_LABELS.get,
+            horizontal=True,
+            help="Das Assistants-Backend verwendet die gespeicherten Anweisungen des Assistants und einen Thread pro Worker. "
+                 "Das zustandslose Backend schickt den System Prompt aus dem Textfeld zusammen mit genau einer Antwort in einer einzigen Anfrage. "
+                 "Der Batch-Job reicht alle Anfragen gesammelt bei der Batch API ein: günstiger, aber die Ergebnisse können bis zu 24 Stunden dauern."
+        )
+
+        # Bündeln mehrerer Antworten pro Anfrage (nur beim zustandslosen Backend)
+        pack_size = 1
+        if backend == BACKEND_CHAT:
+            if st.checkbox("Mehrere Antworten pro Anfrage bündeln", help="Spart den System Prompt pro Antwort. Nicht eindeutig zuordenbare Antworten werden automatisch einzeln nachbewertet."):
+                pack_size = st.number_input(
+                    "Antworten pro Anfrage:",
+                    min_value=2,
+                    max_value=100,
+                    value=DEFAULT_PACK_SIZE
+                )
+
+        # Zusammenfassen gleicher Antworten vor der Bewertung
+        deduplicate = st.checkbox(
+            "Gleiche Antworten nur einmal bewerten",
+            value=True,
+            help="Antworten, die sich nur in Groß-/Kleinschreibung, Leerzeichen, Satzzeichen oder Unicode-Schreibweise unterscheiden, "
+                 "werden einmal bewertet und die Codierung für alle übernommen."
+        )
+
+        # Lokale Regeln für eindeutige Fälle vor der API
+        local_rules = st.checkbox(
+            "Eindeutige Fälle lokal bewerten",
+            value=st.secrets.get("local_rules", {}).get("enabled", True),
+            help="Leere Antworten, reine Zahlen (außer bei Fragen nach einer Zahl) oder Satzzeichen, Tastaturgeklimper wie \"asdfgh\", Zeichenwiederholungen, "
+                 "eine andere Schrift als die Frage und Einträge der Sperrliste erhalten ohne API-Anfrage überall 0 Punkte. "
+                 "Die Codierung ist mit \"lokal bewertet\" gekennzeichnet, alle anderen Antworten bewertet das Modell."
+        )
+
+        # Persistenter Cache für bereits bewertete Antworten
+        use_cache = st.checkbox(
+            "Ergebnis-Cache verwenden",
+            value=st.secrets.get("cache", {}).get("enabled", True),
+            help="Antworten, die mit denselben Anweisungen, demselben Modell und derselben Frage schon bewertet wurden, werden ohne API-Anfrage aus dem Cache übernommen."
+        )
+
+        # Anzahl paralleler Anfragen
+        max_workers = st.number_input(
+            "Parallele Anfragen:",
+            min_value=1,
+            max_value=32,
+            value=int(st.secrets.get("scoring", {}).get("max_workers", DEFAULT_MAX_WORKERS)),
+            help="Anzahl der Antworten, die gleichzeitig bewertet werden. Höhere Werte sind schneller, bis das Rate-Limit der API erreicht ist."
+        )
+
         # Analyse-Button
-        if st.button("Analyse starten", use_container_width=True):
+        # Einstellungen für Einzelfrage und Arbeitsmappe
+        settings = {
+            "backend": backend,
+            "system_prompt": system_prompt,
+            "model": st.secrets["openai"].get("model", st.session_state.assistant_model),
+            "pack_size": pack_size,
+            "max_workers": max_workers,
+            "deduplicate": deduplicate,
+            "local_rules": local_rules,
+            "blocklist": list(st.secrets.get("local_rules", {}).get("blocklist", DEFAULT_BLOCKLIST)),
+            "use_cache": use_cache,
+            "assistant_instructions": st.session_state.assistant_instructions,
+            "assistant_model": st.session_state.assistant_model,
+        }
+
+        analyse_col, experiment_col = st.columns(2)
+        start_analysis = analyse_col.button("Analyse starten", use_container_width=True)
+        start_experiment = experiment_col.button("🧪 Varianten vergleichen", use_container_width=True)
+        if start_analysis or start_experiment:
             if not frage.strip():
                 st.error("⚠️ Bitte gib eine Frage ein.")
             elif not nennungen.strip():
@@ -491,49 +645,205 @@ Relevanz: [Zahl]; Klarheit: [Zahl]; Detailgrad: [Zahl]; Grammatik und Stil: [Zah
             elif not can_process:
                 st.error("⚠️ Bitte korrigiere die Anzahl der Nennungen.")
             else:
-                process_nennungen()
-
+                antworten = [a.strip() for a in nennungen.splitlines() if a.strip()]
+                if start_experiment:
+                    submit_experiment_job(frage, antworten, prompt_variants, settings)
+                else:
+                    submit_job(JobJournal.create(journal_dir, frage, antworten, settings, owner=current_user))
+
+        # Arbeitsmappe mit mehreren offenen Fragen, eine Spalte pro Frage
+        with st.expander("📚 Arbeitsmappe mit mehreren Fragen", expanded=False):
+            uploaded_workbook = st.file_uploader(
+                "Excel-Arbeitsmappe (.xlsx):",
+                type=["xlsx"],
+                help="Jede offene Frage steht in einer eigenen Spalte, die erste Zeile enthält die Spaltenüberschriften. "
+                     "Alle Fragen werden in einem Job mit gemeinsamem Worker-Pool bewertet."
+            )
+            if uploaded_workbook is not None:
+                sheet_names = list_sheets(uploaded_workbook)
+                sheet = st.selectbox("Tabellenblatt:", sheet_names) if len(sheet_names) > 1 else sheet_names[0]
+                sheet_data = load_sheet(uploaded_workbook, sheet)
+                st.caption(f"{len(sheet_data)} Zeilen, {len(sheet_data.header)} Spalten")
+                
+                # Zuordnung Spalte -> Fragetext; Spalten ohne Frage werden nicht bewertet
+                mapping = st.data_editor(
+                    pd.DataFrame({"Spalte": sheet_data.header, "Frage": [""] * len(sheet_data.header)}),
+                    disabled=["Spalte"],
+                    hide_index=True,
+                    use_container_width=True,
+                    key=f"mapping_{uploaded_workbook.file_id}_{sheet}"
+                )
+                fragen = [(spalte, frage_text.strip()) for spalte, frage_text in zip(mapping["Spalte"], mapping["Frage"]) if isinstance(frage_text, str) and frage_text.strip()]
+                
+                if st.button("Arbeitsmappe bewerten", use_container_width=True):
+                    if not fragen:
+                        st.error("⚠️ Bitte trage für mindestens eine Spalte die zugehörige Frage ein.")
+                    else:
+                        submit_workbook_job(uploaded_workbook.name, sheet_data, fragen, settings)
+
+        # Fortschritt des aktuellen Jobs, sonst die Meldungen des zuletzt beendeten Jobs
+        if st.session_state.get("active_job_id"):
+            show_job_status()
+        else:
+            for kind, text in st.session_state.get("job_summary", []):
+                getattr(st, kind)(text)
+
+        # Eigene Jobs dieser Stunde, z.B. nach einem neu geöffneten Browser-Tab
+        my_jobs = job_manager.jobs_for(current_user)
+        if my_jobs:
+            with st.expander(f"📋 Meine Jobs ({len(my_jobs)})", expanded=False):
+                for job in my_jobs:
+                    st.markdown(
+                        f"**{job.title}**  \n"
+                        f"Job {job.job_id} | {JOB_STATUS_LABELS.get(job.status, job.status)} | "
+                        f"{job.resumed_count + job.processed_count}/{job.total} Antworten bewertet"
+                    )
+                    if job.job_id != st.session_state.get("active_job_id"):
+                        if st.button("Anzeigen", key=f"show_{job.job_id}", use_container_width=True):
+                            st.session_state.active_job_id = job.job_id
+                            st.rerun()
+
+        # Eigene unterbrochene Jobs (z.B. nach Neustart des Servers) fortsetzen; laufende Jobs ausgenommen
+        active_job_ids = job_manager.active_job_ids()
+        unfinished_jobs = [
+            job for job in list_unfinished_jobs(journal_dir, owner=current_user, retention_days=journal_retention_days)
+            if job["job_id"] not in active_job_ids
+        ]
+        if unfinished_jobs:
+            with st.expander(f"⏯️ Unterbrochene Jobs ({len(unfinished_jobs)})", expanded=False):
+                for job in unfinished_jobs:
+                    created = time.strftime("%d.%m.%Y %H:%M", time.localtime(job["created_at"]))
+                    last_active = time.strftime("%d.%m.%Y %H:%M", time.localtime(job["modified_at"]))
+                    st.markdown(
+                        f"**{job['frage']}**  \n"
+                        f"Job {job['job_id']} vom {created}, zuletzt aktiv {last_active} | "
+                        f"{job['result_count']}/{job['antwort_count']} Antworten bewertet | "
+                        f"{BACKEND_LABELS[job['backend']]}"
+                    )
+                    if st.button("Fortsetzen", key=f"resume_{job['job_id']}", use_container_width=True):
+                        # Erst beim Fortsetzen wird das ganze Journal gelesen
+                        submit_job(JobJournal.load(job["path"]))
+                        st.rerun()
     with col2:
         st.subheader("📊 Ergebnisbereich")
         
-        # Debug-Bereich
+        # Debug-Bereich mit der Telemetrie der Modell-Aufrufe
         with st.expander("🔍 Debug-Informationen", expanded=False):
-            st.markdown("### API-Anfragen")
-            if "debug_info" in st.session_state and st.session_state.debug_info:
-                for idx, debug_data in enumerate(st.session_state.debug_info, 1):
-                    st.markdown(f"**Anfrage {idx}:**")
-                    st.code(str(debug_data), language="json")
+            st.markdown("### API-Aufrufe")
+            call_trace = st.session_state.get("call_trace")
+            if call_trace is not None and call_trace.total_count:
+                trace_summary = call_trace.summary()
+                metric_cols = st.columns(5)
+                metric_cols[0].metric("Aufrufe", trace_summary["calls"])
+                metric_cols[1].metric("Fehlerquote", f"{trace_summary['error_rate']:.1%}")
+                for metric_col, p in zip(metric_cols[2:], (50, 95, 99)):
+                    latency = trace_summary[f"latency_p{p}"]
+                    metric_col.metric(f"Latenz p{p}", f"{latency:.2f} s" if latency is not None else "–")
+                queue_times = [trace_summary[f"queue_p{p}"] for p in (50, 95, 99)]
+                if None not in queue_times:
+                    st.caption("Wartezeit im Worker-Pool p50/p95/p99: " + " / ".join(f"{value:.2f} s" for value in queue_times))
+                
+                # Immer nur eine Seite des Ringpuffers als Tabelle anzeigen
+                page = page_selector(len(call_trace), TRACE_PAGE_SIZE, key="trace_page")
+                st.dataframe(
+                    pd.DataFrame(call_trace.page(page, TRACE_PAGE_SIZE), columns=[*TRACE_FIELDS, "error"]),
+                    use_container_width=True,
+                    hide_index=True
+                )
+                st.caption(f"Angezeigt werden die letzten {len(call_trace)} von {call_trace.total_count} Aufrufen, der Download enthält alle.")
+                st.download_button(
+                    label="📥 Trace als JSONL herunterladen",
+                    data=call_trace.to_jsonl,
+                    file_name="BonsAI_Score_Trace.jsonl",
+                    mime="application/x-ndjson",
+                    use_container_width=True
+                )
             else:
-                st.info("Noch keine Debug-Informationen verfügbar. Starte eine Analyse, um die API-Anfragen zu sehen.")
+                st.info("Noch keine Debug-Informationen verfügbar. Starte eine Analyse, um die API-Aufrufe zu sehen.")
+        
+        # Ergebnisse der zuletzt bewerteten Arbeitsmappe
+        if "workbook_results" in st.session_state:
+            with st.expander(f"📚 Ergebnisse der Arbeitsmappe {st.session_state.workbook_name}", expanded=True):
+                st.dataframe(st.session_state.workbook_results, use_container_width=True, hide_index=True)
+                workbook_results, workbook_sheet = st.session_state.workbook_results, st.session_state.workbook_sheet
+                st.download_button(
+                    label="📥 Arbeitsmappe mit Scores herunterladen",
+                    data=cached_export("workbook_xlsx", workbook_results, 0, lambda: xlsx_bytes([(workbook_sheet, workbook_results, False)])),
+                    file_name=f"BonsAI_Score_{os.path.splitext(st.session_state.workbook_name)[0]}.xlsx",
+                    mime=XLSX_MIME,
+                    use_container_width=True
+                )
+        
+        # Vergleich der Prompt-Varianten des letzten Experiments
+        if "experiment_results" in st.session_state:
+            with st.expander("🧪 Vergleich der Prompt-Varianten", expanded=True):
+                st.caption(f"Gesamt-Score pro Variante. Übereinstimmung, Abweichung und Rangkorrelation beziehen sich auf Variante {PROMPT_VARIANT_NAMES[0]}.")
+                st.dataframe(st.session_state.experiment_summary, use_container_width=True)
+                st.dataframe(st.session_state.experiment_results, use_container_width=True, hide_index=True)
+                experiment_results, experiment_summary = st.session_state.experiment_results, st.session_state.experiment_summary
+                st.download_button(
+                    label="📥 Vergleich herunterladen",
+                    data=cached_export("experiment_xlsx", experiment_results, 0, lambda: xlsx_bytes([("Vergleich", experiment_results, False), ("Statistik", experiment_summary, True)])),
+                    file_name="BonsAI_Score_Experiment.xlsx",
+                    mime=XLSX_MIME,
+                    use_container_width=True
+                )
         
         # Ergebnisanzeige mit Live-Updates
         result_placeholder = st.empty()
         
-        if st.session_state.results_df.empty:
+        if st.session_state.results.completed_count == 0:
             result_placeholder.info("Hier erscheinen die Ergebnisse, sobald du die Analyse startest.")
         else:
-            # DataFrame anzeigen
-            result_placeholder.dataframe(
-                st.session_state.results_df,
-                use_container_width=True,
-                hide_index=True
-            )
+            results = st.session_state.results
+            score_table, score_stats = results.score_table, results.score_stats
+            
+            # DataFrame mit Score-Spalten seitenweise anzeigen, an den Browser geht nur die aktuelle Seite
+            with result_placeholder.container():
+                page = page_selector(len(score_table), RESULT_PAGE_SIZE, key="result_page")
+                st.dataframe(
+                    score_table.iloc[(page - 1) * RESULT_PAGE_SIZE:page * RESULT_PAGE_SIZE],
+                    use_container_width=True,
+                    hide_index=True
+                )
+            
+            # Verteilung der Scores
+            with st.expander("📈 Verteilung der Scores", expanded=False):
+                unparsed_count = int(score_table[PARSE_FLAG_COLUMN].sum())
+                if unparsed_count:
+                    st.warning(f"{unparsed_count} Codierungen konnten nicht vollständig ausgewertet werden.")
+                st.dataframe(score_stats, use_container_width=True)
             
             # Download-Option nur anzeigen, wenn Ergebnisse vorliegen
             st.markdown("---")
             st.subheader("💾 Download")
             
-            # Excel-Download
-            buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-                st.session_state.results_df.to_excel(writer, sheet_name='Ergebnisse', index=False)
-            
-            st.download_button(
-                label="📥 Ergebnisse als XLSX herunterladen",
-                data=buffer.getvalue(),
-                file_name="BonsAI_Score_Ergebnisse.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
+            # Exportdateien werden erst beim Klick und pro Ergebnisstand nur einmal erzeugt
+            export_col1, export_col2, export_col3 = st.columns(3)
+            with export_col1:
+                st.download_button(
+                    label="📥 XLSX",
+                    data=cached_export("xlsx", results, results.version, lambda: xlsx_bytes([("Ergebnisse", score_table, False), ("Statistik", score_stats, True)])),
+                    file_name="BonsAI_Score_Ergebnisse.xlsx",
+                    mime=XLSX_MIME,
+                    use_container_width=True
+                )
+            with export_col2:
+                st.download_button(
+                    label="📥 CSV",
+                    data=cached_export("csv", results, results.version, lambda: csv_bytes(score_table)),
+                    file_name="BonsAI_Score_Ergebnisse.csv",
+                    mime=CSV_MIME,
+                    use_container_width=True
+                )
+            with export_col3:
+                st.download_button(
+                    label="📥 Parquet",
+                    data=cached_export("parquet", results, results.version, lambda: parquet_bytes(score_table)),
+                    file_name="BonsAI_Score_Ergebnisse.parquet",
+                    mime=PARQUET_MIME,
+                    use_container_width=True,
+                    help="Kompaktes Spaltenformat für große Ergebnismengen, z.B. zur Weiterverarbeitung mit pandas oder R."
+                )
 
 
@@ -0,0 +1,51 @@
+"""Speicherbedarf einer Streamlit-Sitzung.
+
+Misst für jeden Eintrag in st.session_state die Bytes aller erreichbaren Objekte:
+DataFrames über memory_usage(deep=True), sonst rekursiv über Container und die
+Attribute eigener Klassen. Jedes Objekt wird pro Bericht nur einmal gezählt, auch wenn
+mehrere Einträge darauf verweisen (z.B. Ergebnisspeicher und Export-Cache). Objekte,
+die sich alle Sitzungen teilen (z.B. abgelegte Prompts), lassen sich ausnehmen.
+"""
+import collections
+import sys
+import threading
+import types
+
+import pandas as pd
+
+# Typen, die nicht zur Sitzung gehören und nicht durchsucht werden
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, type(threading.Lock()), threading.Event)
+
+
+def deep_size(obj, seen=None):
+    """Bytes von obj und allen darüber erreichbaren Objekten, deren id nicht in seen steht."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, _SKIPPED_TYPES):
+        return 0
+    seen.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        usage = obj.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(deep_size(key, seen) + deep_size(value, seen) for key, value in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset, collections.deque)):
+        return size + sum(deep_size(item, seen) for item in list(obj))
+    if hasattr(obj, "__dict__"):
+        size += deep_size(vars(obj), seen)
+    for slot in getattr(type(obj), "__slots__", ()):
+        size += deep_size(getattr(obj, slot, None), seen)
+    return size
+
+
+def session_memory(session_state, shared=()):
+    """Liste von (Schlüssel, Bytes) für alle Einträge der Sitzung, die größten zuerst.
+
+    Objekte in shared (z.B. prompt_store.registered_prompts()) werden nicht mitgezählt.
+    """
+    seen = {id(obj) for obj in shared}
+    report = [(str(key), deep_size(session_state[key], seen)) for key in list(session_state.keys())]
+    return sorted(report, key=lambda entry: entry[1], reverse=True)
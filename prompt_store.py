@@ -0,0 +1,40 @@
+"""Prozessweite Ablage der Prompt-Texte, jeder Text nur einmal.
+
+Sitzungen verweisen über die Prompt-ID (score_cache.prompt_hash) auf einen Prompt,
+statt eine eigene Kopie des Textes zu halten, und die Einstellungen aller Jobs teilen
+sich pro Prompt einen einzigen String. Die Ablage wächst nur mit der Zahl verschiedener
+Prompts, mit denen tatsächlich bewertet wurde, nicht mit Sitzungen oder Antworten.
+"""
+import threading
+
+from score_cache import prompt_hash
+
+_prompts = {}
+_lock = threading.Lock()
+
+
+def register_prompt(text):
+    """Legt text einmal ab und gibt die Prompt-ID zurück."""
+    prompt_id = prompt_hash(text)
+    with _lock:
+        _prompts.setdefault(prompt_id, text)
+    return prompt_id
+
+
+def prompt_text(prompt_id):
+    """Text zu einer Prompt-ID oder None, wenn sie unbekannt ist."""
+    with _lock:
+        return _prompts.get(prompt_id)
+
+
+def shared_prompt(text):
+    """Die abgelegte Instanz von text, damit Einstellungen keine eigene Kopie halten."""
+    if not text:
+        return text
+    return prompt_text(register_prompt(text))
+
+
+def registered_prompts():
+    """Alle abgelegten Texte, z.B. um sie im Speicherbericht einer Sitzung auszunehmen."""
+    with _lock:
+        return list(_prompts.values())
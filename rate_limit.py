@@ -0,0 +1,223 @@
+"""Clientseitige Steuerung der API-Last für alle Bewertungsjobs des Prozesses.
+
+Alle Worker aller eingeloggten Nutzer holen sich vor jeder Modell-Anfrage eine
+Freigabe beim selben RateGovernor. Der Governor kombiniert
+- einen Token-Bucket für Anfragen und Tokens pro Minute, der sich an die
+  x-ratelimit-Header der API anpasst,
+- eine gemeinsame Pause, wenn die API mit 429 und Retry-After antwortet, und
+- einen Circuit Breaker, der bei einem Ausfall (Verbindungsfehler, 5xx) alle Worker
+  anhält, statt sie gleichzeitig gegen die API laufen zu lassen.
+Wartezeiten ergeben sich immer aus Bucket, Headern oder Backoff, nie aus festen Pausen.
+"""
+import email.utils
+import random
+import threading
+import time
+
+import openai
+
+# Standardlimits pro Minute, überschreibbar über [jobs] in den Secrets
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200_000
+
+# Circuit Breaker: nach so vielen Ausfällen in Folge werden alle Anfragen angehalten
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_COOLDOWN = 10
+MAX_COOLDOWN = 300
+
+# Obergrenze für den exponentiellen Backoff (Sekunden)
+MAX_BACKOFF = 60
+
+# HTTP-Status, bei denen sich eine Wiederholung lohnt
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+
+# Fehlercodes fehlgeschlagener Assistants-Runs, bei denen sich eine Wiederholung lohnt
+RETRYABLE_RUN_ERRORS = {"rate_limit_exceeded", "server_error"}
+
+def estimate_tokens(*texts):
+    """Grobe Schätzung der Tokens einer Anfrage (etwa vier Zeichen pro Token)."""
+    return sum(len(text) for text in texts if text) // 4 + 1
+
+
+def _status_code(error):
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error):
+    """Lohnt sich eine Wiederholung? Verbindungsfehler, Timeouts, 408/409/429 und 5xx ja, Anfragefehler nicht."""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    status = _status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES or status >= 500
+    return getattr(error, "retryable", False)
+
+
+def is_outage(error):
+    """Fehler, die auf einen Ausfall der API hindeuten und den Circuit Breaker füttern."""
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    status = _status_code(error)
+    return status is not None and status >= 500
+
+
+def retry_after(error):
+    """Wartezeit aus den Headern einer Fehlerantwort (retry-after-ms, retry-after) oder None."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return float(value)
+            except ValueError:
+                # Retry-After als HTTP-Datum
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def backoff_delay(attempt, base, cap=MAX_BACKOFF):
+    """Exponentieller Backoff mit vollem Jitter: zufällig zwischen 0 und base * 2^attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class RateGovernor:
+    """Token-Bucket für Anfragen und Tokens pro Minute mit Header-Anpassung und Circuit Breaker, threadsicher."""
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD, cooldown=DEFAULT_COOLDOWN):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._open_until = 0.0
+        self._cooldown = cooldown
+        self._consecutive_failures = 0
+        self._lock = threading.Lock()
+
+        # Zähler für die Anzeige
+        self.throttled_count = 0
+        self.circuit_open_count = 0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def acquire(self, tokens=0, requests=1):
+        """Blockiert, bis Pause und Circuit Breaker es erlauben und das Budget reicht, und bucht dann ab."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                tokens = min(tokens, self.tokens_per_minute)
+                requests = min(requests, self.requests_per_minute)
+                blocked = max(self._paused_until, self._open_until) - now
+                if blocked <= 0 and self._requests >= requests and self._tokens >= tokens:
+                    self._requests -= requests
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    blocked,
+                    (requests - self._requests) * 60 / self.requests_per_minute,
+                    (tokens - self._tokens) * 60 / self.tokens_per_minute,
+                )
+            time.sleep(max(wait, 0.001))
+
+    def observe_headers(self, headers):
+        """Gleicht den Bucket mit den x-ratelimit-Headern einer API-Antwort ab.
+
+        Die Limits setzen die Kapazität und Nachfüllrate, "remaining" begrenzt den
+        aktuellen Füllstand. Ist das Kontingent erschöpft, wartet acquire damit genau so
+        lange, bis die API wieder Platz hat.
+        """
+        if not headers:
+            return
+        with self._lock:
+            self._refill(time.monotonic())
+            for kind in ("requests", "tokens"):
+                limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+                remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+                if limit:
+                    setattr(self, f"{kind}_per_minute", limit)
+                if remaining is not None:
+                    setattr(self, f"_{kind}", min(getattr(self, f"_{kind}"), remaining))
+
+    def pause(self, seconds):
+        """Hält alle Worker für seconds an (z.B. nach 429 mit Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.throttled_count += 1
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._cooldown = self.base_cooldown
+
+    def record_failure(self, error):
+        """Meldet einen fehlgeschlagenen Aufruf; Ausfälle in Folge öffnen den Circuit Breaker."""
+        if not is_outage(error):
+            return
+        with self._lock:
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._open_until = time.monotonic() + self._cooldown
+                self._cooldown = min(self._cooldown * 2, MAX_COOLDOWN)
+                self._consecutive_failures = 0
+                self.circuit_open_count += 1
+
+    @property
+    def circuit_open(self):
+        return time.monotonic() < self._open_until
+
+
+def _header_number(headers, name):
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def call_with_retries(request, governor=None, tokens=0, max_retries=3, retry_delay=1):
+    """Führt request() mit Freigabe durch den Governor und Wiederholungen aus.
+
+    Nur wiederholbare Fehler (siehe is_retryable) werden wiederholt, mit exponentiellem
+    Backoff und Jitter bzw. der von der API genannten Retry-After-Zeit. Gibt
+    (ergebnis, versuche) zurück; nach dem letzten Versuch oder bei nicht wiederholbaren
+    Fehlern wird die Exception mit dem Attribut attempts weitergereicht.
+    """
+    for attempt in range(max_retries):
+        if governor is not None:
+            governor.acquire(tokens=tokens)
+        try:
+            result = request()
+        except Exception as e:
+            e.attempts = attempt + 1
+            if governor is not None:
+                governor.record_failure(e)
+            if not is_retryable(e) or attempt == max_retries - 1:
+                raise
+            wait = retry_after(e)
+            if wait is not None and governor is not None:
+                # Die Pause gilt für alle Worker, die Freigabe wartet dann automatisch
+                governor.pause(wait)
+            else:
+                time.sleep(wait if wait is not None else backoff_delay(attempt, retry_delay))
+            continue
+        if governor is not None:
+            governor.record_success()
+        return result, attempt + 1
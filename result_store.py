@@ -0,0 +1,103 @@
+"""Ergebnisspeicher für einen Bewertungslauf.
+
+Während ein Job läuft, werden die Codierungen in vorab angelegte Listen geschrieben,
+jede Antwort genau einmal; laufende Jobs zeigen seitenweise die zuletzt bewerteten
+Zeilen (recent), ohne jedes Mal die ganze Tabelle aufzubauen. Ist der Job beendet,
+übernimmt die Sitzung nur eine ResultTable: eine kompakte, unveränderliche Tabelle mit
+typisierten Spalten, die einmal geparst wird. Das ersetzt das wiederholte pd.concat und
+das komplette CSV-Serialisieren, deren Aufwand mit der Jobgröße quadratisch wuchs.
+"""
+import array
+
+import pandas as pd
+
+from score_stats import parse_codierungen, score_summary
+
+# Spalten der Ergebnistabelle
+RESULT_COLUMNS = ["Antwort", "Codierung"]
+
+# Höchster Anteil verschiedener Codierungen, bei dem die Spalte als Kategorie gespeichert wird
+MAX_CATEGORY_SHARE = 0.5
+
+
+class ResultStore:
+    """Nimmt die Codierungen eines Laufs in Eingabereihenfolge auf."""
+
+    def __init__(self, antworten):
+        # Die Liste des Journals wird nicht kopiert, sie ändert sich während des Laufs nicht
+        self.antworten = antworten
+        self.codierungen = [None] * len(self.antworten)
+        self.completed_count = 0
+        # Wird bei jeder Änderung erhöht und dient als Schlüssel für abgeleitete Ansichten
+        self.version = 0
+        # Indizes in der Reihenfolge der Fertigstellung für die Anzeige laufender Jobs
+        self._order = array.array("l")
+
+    def __len__(self):
+        return len(self.antworten)
+
+    def record(self, index, codierung):
+        """Speichert die Codierung der Antwort an Position index."""
+        if self.codierungen[index] is None:
+            self.completed_count += 1
+        self.codierungen[index] = codierung
+        self._order.append(index)
+        self.version += 1
+
+    def to_dataframe(self):
+        """Ergebnistabelle aller bisher bewerteten Antworten in Eingabereihenfolge."""
+        fertig = [index for index, codierung in enumerate(self.codierungen) if codierung is not None]
+        return pd.DataFrame(
+            {"Antwort": [self.antworten[index] for index in fertig], "Codierung": [self.codierungen[index] for index in fertig]},
+            columns=RESULT_COLUMNS
+        )
+
+    def recent(self, number, size):
+        """Zeilen einer Seite (ab 1) in der Reihenfolge der Fertigstellung, die neueste zuerst.
+
+        Der Aufwand hängt nur von size ab; der Bewertungsthread darf währenddessen weiter schreiben.
+        """
+        ende = max(0, len(self._order) - (number - 1) * size)
+        indices = self._order[max(0, ende - size):ende][::-1]
+        return pd.DataFrame(
+            {"Antwort": [self.antworten[index] for index in indices], "Codierung": [self.codierungen[index] for index in indices]},
+            columns=RESULT_COLUMNS
+        )
+
+
+class ResultTable:
+    """Unveränderliche Ergebnisse eines beendeten Laufs in typisierten Spalten.
+
+    Antworten liegen als Arrow-Strings vor, ohne ein Python-Objekt pro Zeile. Codierungen
+    werden zur Kategorie, wenn sich viele wiederholen (lokal bewertete Antworten,
+    Fehlertexte, doppelte Antworten), die Scores sind Int8-Spalten. score_table und
+    score_stats werden einmal berechnet und von Anzeige und Export gemeinsam genutzt.
+    """
+
+    # Eine ResultTable ändert sich nicht mehr, die Version dient nur als Schlüssel für Exporte
+    version = 0
+
+    def __init__(self, antworten, codierungen):
+        fertig = [index for index, codierung in enumerate(codierungen) if codierung is not None]
+        if len(fertig) < len(codierungen):
+            antworten = [antworten[index] for index in fertig]
+            codierungen = [codierungen[index] for index in fertig]
+        codierung_column = pd.Series(codierungen, dtype="str")
+        if codierung_column.nunique() <= MAX_CATEGORY_SHARE * len(codierung_column):
+            codierung_column = codierung_column.astype("category")
+        df = pd.DataFrame({"Antwort": pd.Series(antworten, dtype="str"), "Codierung": codierung_column}, columns=RESULT_COLUMNS)
+        scores = parse_codierungen(df["Codierung"])
+        self.score_table = pd.concat([df, scores], axis=1)
+        self.score_stats = score_summary(scores)
+        self.completed_count = len(df)
+
+    @classmethod
+    def from_store(cls, store):
+        return cls(store.antworten, store.codierungen)
+
+    def __len__(self):
+        return self.completed_count
+
+    def to_dataframe(self):
+        """Antworten und Codierungen in Eingabereihenfolge."""
+        return self.score_table[RESULT_COLUMNS]
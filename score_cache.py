@@ -0,0 +1,153 @@
+"""Persistenter Cache für bereits bewertete Antworten.
+
+Die Codierungen werden in einer SQLite-Datei gespeichert. Der Schlüssel ist ein Hash
+aus Anweisungen (System Prompt bzw. Assistant-Instructions), Modell, Frage und
+normalisierter Antwort. Wiederholte Läufe mit demselben Prompt kosten dadurch
+keine API-Anfragen mehr.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Standardwerte für Speicherort und Verdrängung
+DEFAULT_CACHE_PATH = os.path.join(".cache", "bonsai_score_cache.sqlite")
+DEFAULT_TTL_DAYS = 30
+DEFAULT_MAX_ENTRIES = 200_000
+
+# Anzahl neuer Einträge, die gesammelt in einer Transaktion geschrieben werden
+WRITE_BATCH_SIZE = 50
+
+
+def prompt_hash(instructions):
+    """Hash der Anweisungen, über den sich alle Einträge eines Prompts invalidieren lassen."""
+    return hashlib.sha256((instructions or "").encode("utf-8")).hexdigest()
+
+
+def cache_key(instructions, model, frage, antwort):
+    """Schlüssel einer Bewertung; Leerraum in der Antwort wird vereinheitlicht."""
+    payload = json.dumps([prompt_hash(instructions), model, frage.strip(), " ".join(antwort.split())], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(codierung):
+    """Nur vollständige Score-Zeilen werden gespeichert, keine Fehler- oder Leerantworten."""
+    return "Gesamt" in codierung
+
+
+def cached_result(codierung):
+    """Ergebnis-Dict für einen Cache-Treffer, ohne Anfragen und Token-Verbrauch."""
+    return {"codierung": codierung, "prompt_tokens": 0, "completion_tokens": 0, "requests": 0, "latency": None, "cached": True}
+
+
+class ScoreCache:
+    """Bewertungs-Cache in einer SQLite-Datei mit TTL- und Größenbegrenzung."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_days=DEFAULT_TTL_DAYS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400
+        self.max_entries = max_entries
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "key TEXT PRIMARY KEY, prompt_hash TEXT NOT NULL, codierung TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS scores_prompt_hash ON scores (prompt_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS scores_last_used ON scores (last_used)")
+
+    @contextlib.contextmanager
+    def _connect(self):
+        # Eine Verbindung pro Vorgang, damit der Cache aus beliebigen Threads nutzbar ist
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, keys):
+        """Gibt ein Dict key -> Codierung für alle nicht abgelaufenen Treffer zurück."""
+        found = {}
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._connect() as conn:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, codierung FROM scores WHERE key IN ({placeholders}) AND created_at >= ?",
+                    (*chunk, now - self.ttl_seconds)
+                ).fetchall()
+                found.update(rows)
+            conn.executemany("UPDATE scores SET last_used = ? WHERE key = ?", [(now, key) for key in found])
+        return found
+
+    def put_many(self, entries):
+        """Speichert Tupel (key, prompt_hash, codierung) und verdrängt danach alte Einträge."""
+        if not entries:
+            return
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO scores (key, prompt_hash, codierung, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                [(key, hash_, codierung, now, now) for key, hash_, codierung in entries]
+            )
+            self._evict(conn, now)
+
+    def invalidate_prompt(self, hash_):
+        """Löscht alle Einträge, die mit den Anweisungen zu hash_ erzeugt wurden."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM scores WHERE prompt_hash = ?", (hash_,))
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM scores WHERE created_at < ?", (now - self.ttl_seconds,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM scores").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM scores WHERE key IN (SELECT key FROM scores ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+
+def score_with_cache(cache, instructions, model, frage, antworten, score_missing):
+    """Liefert Cache-Treffer sofort und bewertet nur die übrigen Antworten.
+
+    score_missing(indices) muss wie scoring.score_antworten Tupel (position, result,
+    fehler) liefern, wobei sich position auf die Liste indices bezieht. Liefert Tupel
+    (index, result, fehler) bezogen auf antworten; Treffer sind an result["cached"]
+    erkennbar. Neue Codierungen werden gesammelt in den Cache geschrieben.
+    """
+    hash_ = prompt_hash(instructions)
+    keys = [cache_key(instructions, model, frage, antwort) for antwort in antworten]
+    cached = cache.get_many(keys)
+
+    missing = []
+    for index, key in enumerate(keys):
+        if key in cached:
+            yield index, cached_result(cached[key]), None
+        else:
+            missing.append(index)
+
+    if not missing:
+        return
+
+    new_entries = []
+    try:
+        for position, result, fehler in score_missing(missing):
+            index = missing[position]
+            if fehler is None and is_cacheable(result["codierung"]):
+                new_entries.append((keys[index], hash_, result["codierung"]))
+                if len(new_entries) >= WRITE_BATCH_SIZE:
+                    cache.put_many(new_entries)
+                    new_entries = []
+            yield index, result, fehler
+    finally:
+        # Auch bei Abbruch alles Bezahlte sichern
+        cache.put_many(new_entries)
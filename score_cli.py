@@ -0,0 +1,304 @@
+"""Bewertung großer Antwortdateien ohne Browser.
+
+Liest die Antworten einer CSV- oder XLSX-Datei blockweise, bewertet sie mit denselben
+Backends, Einstellungen und demselben Cache wie die Web-App und hängt die Ergebnisse
+blockweise an eine CSV-Datei an. Weder Eingabe noch Ausgabe werden vollständig im
+Speicher gehalten, so lassen sich auch Studien mit 50.000 Antworten per Cron bewerten.
+Beim Batch-Backend wird die ganze Datei (bis MAX_BATCH_REQUESTS Antworten) als ein
+Batch-Job eingereicht statt als viele nacheinander abgewartete Jobs.
+
+Fehlgeschlagene Antworten werden nicht in die Ausgabedatei geschrieben; --resume bewertet
+alle Zeilen, die dort noch fehlen, also auch diese erneut.
+
+Die Zugangsdaten kommen wie bei der Web-App aus .streamlit/secrets.toml ([openai],
+[assistant], [cache], [jobs], [local_rules]), der API-Key ersatzweise aus OPENAI_API_KEY.
+
+Start:
+    python score_cli.py antworten.xlsx ergebnisse.csv --frage "Was ist dein Lieblingsessen?" --backend chat
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+import tomllib
+
+import openpyxl
+import pandas as pd
+from openai import OpenAI
+
+from batch_scoring import BACKEND_BATCH, MAX_BATCH_REQUESTS
+from job_manager import group_for_settings, score_unique_antworten
+from local_rules import DEFAULT_BLOCKLIST
+from rate_limit import DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE, RateGovernor
+from score_cache import DEFAULT_CACHE_PATH, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_DAYS, ScoreCache
+from score_stats import parse_codierungen
+from scoring import BACKEND_ASSISTANTS, BACKEND_CHAT, DEFAULT_MAX_WORKERS, DEFAULT_SYSTEM_PROMPT
+
+# Standardpfad der Secrets, wie bei Streamlit
+DEFAULT_SECRETS_PATH = os.path.join(".streamlit", "secrets.toml")
+
+# Anzahl der Antworten, die gemeinsam gelesen, bewertet und geschrieben werden
+DEFAULT_CHUNK_SIZE = 500
+
+# Spalten der Ausgabedatei vor den Score-Spalten
+OUTPUT_COLUMNS = ["Zeile", "Antwort", "Codierung"]
+
+
+def load_secrets(path=DEFAULT_SECRETS_PATH):
+    """Liest die Secrets der Web-App; fehlt die Datei, wird ein leeres Dict zurückgegeben."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "rb") as file:
+        return tomllib.load(file)
+
+
+def _select_column(header, column):
+    if column is None:
+        return 0
+    if column in header:
+        return header.index(column)
+    if str(column).isdigit() and int(column) < len(header):
+        return int(column)
+    raise ValueError(f"Spalte '{column}' nicht gefunden. Vorhandene Spalten: "
+                     f"{', '.join(f'{position}: {name}' for position, name in enumerate(header))}")
+
+
+def read_header(path, sheet=None):
+    """Spaltenüberschriften einer CSV- oder XLSX-Datei, ohne die Daten zu lesen."""
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            worksheet = workbook[sheet] if sheet else workbook.active
+            return [str(value) if value is not None else "" for value in next(worksheet.iter_rows(values_only=True), ())]
+        finally:
+            workbook.close()
+    return list(pd.read_csv(path, sep=None, engine="python", dtype=str, keep_default_na=False, nrows=0).columns)
+
+
+def _iter_csv_rows(path, column):
+    # Trennzeichen (Komma oder Semikolon aus deutschem Excel) wird erkannt
+    reader = pd.read_csv(path, sep=None, engine="python", dtype=str, keep_default_na=False, chunksize=DEFAULT_CHUNK_SIZE)
+    position, zeile = None, 1
+    for chunk in reader:
+        if position is None:
+            position = _select_column(list(chunk.columns), column)
+        for antwort in chunk.iloc[:, position]:
+            zeile += 1
+            yield zeile, antwort
+
+
+def _iter_xlsx_rows(path, column, sheet=None):
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = [str(value) if value is not None else "" for value in next(rows, ())]
+        position = _select_column(header, column)
+        for zeile, row in enumerate(rows, 2):
+            value = row[position] if position < len(row) else None
+            yield zeile, "" if value is None else str(value)
+    finally:
+        workbook.close()
+
+
+def iter_answer_chunks(path, column=None, sheet=None, chunk_size=DEFAULT_CHUNK_SIZE, skip_rows=frozenset()):
+    """Liest die Antwortspalte einer CSV- oder XLSX-Datei in Blöcken.
+
+    Liefert Listen von (zeile, antwort); zeile ist die Zeilennummer in der Datei
+    (Kopfzeile = 1). Leere Antworten und Zeilen aus skip_rows werden übersprungen.
+    """
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        rows = _iter_xlsx_rows(path, column, sheet)
+    else:
+        rows = _iter_csv_rows(path, column)
+
+    chunk = []
+    for zeile, antwort in rows:
+        antwort = antwort.strip()
+        if zeile in skip_rows or not antwort:
+            continue
+        chunk.append((zeile, antwort))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def written_rows(output_path):
+    """Zeilennummern, die bereits in der Ausgabedatei stehen (leer, wenn es sie nicht gibt)."""
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, newline="", encoding="utf-8") as file:
+        return {int(row["Zeile"]) for row in csv.DictReader(file) if row.get("Zeile", "").isdigit()}
+
+
+def score_file(input_path, output_path, frage, settings, client, assistant_id=None, column=None, sheet=None,
+               chunk_size=DEFAULT_CHUNK_SIZE, governor=None, score_cache=None, resume=False, on_progress=None):
+    """Bewertet alle Antworten einer Datei und hängt die Ergebnisse blockweise an output_path an.
+
+    settings hat denselben Aufbau wie die Job-Einstellungen der Web-App. Nur erfolgreich
+    bewertete Antworten werden geschrieben; mit resume=True werden Zeilen übersprungen,
+    die schon in der Ausgabedatei stehen, fehlgeschlagene also erneut bewertet. Beim
+    Batch-Backend ist ein Block so groß wie ein Batch-Job sein darf. on_progress(summary)
+    wird nach jedem geschriebenen Block aufgerufen. Gibt die Kennzahlen des Laufs zurück.
+    """
+    skip_rows = written_rows(output_path) if resume else set()
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+    if settings["backend"] == BACKEND_BATCH:
+        chunk_size = MAX_BATCH_REQUESTS
+    summary = {"processed": 0, "errors": 0, "cache_hits": 0, "local_hits": 0, "requests": 0.0, "skipped": len(skip_rows), "seconds": 0.0}
+    start = time.perf_counter()
+
+    for chunk in iter_answer_chunks(input_path, column, sheet, chunk_size, skip_rows):
+        antworten = [antwort for _, antwort in chunk]
+        codierungen = [None] * len(chunk)
+        failed = [False] * len(chunk)
+
+        # Gleiche Antworten innerhalb des Blocks nur einmal bewerten, blockübergreifend hilft der Cache
+        eindeutige_antworten, gruppen = group_for_settings(antworten, settings)
+        results = score_unique_antworten(client, assistant_id, frage, eindeutige_antworten, settings, governor=governor, score_cache=score_cache)
+        for unique_index, result, fehler in results:
+            gruppe = gruppen[unique_index]
+            for position in gruppe:
+                codierungen[position] = result["codierung"]
+                failed[position] = fehler is not None
+            if fehler is None:
+                summary["processed"] += len(gruppe)
+                summary["requests"] += result["requests"]
+                if result.get("cached"):
+                    summary["cache_hits"] += len(gruppe)
+                if result.get("local"):
+                    summary["local_hits"] += len(gruppe)
+            else:
+                summary["errors"] += len(gruppe)
+
+        # Block in Eingabereihenfolge mit denselben Score-Spalten wie der Excel-Export anhängen;
+        # fehlgeschlagene Antworten fehlen, damit --resume sie erneut bewertet
+        chunk_df = pd.DataFrame({"Zeile": [zeile for zeile, _ in chunk], "Antwort": antworten, "Codierung": codierungen}, columns=OUTPUT_COLUMNS)
+        chunk_df = chunk_df[[not fehlgeschlagen for fehlgeschlagen in failed]].reset_index(drop=True)
+        chunk_df = pd.concat([chunk_df, parse_codierungen(chunk_df["Codierung"])], axis=1)
+        write_header = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        chunk_df.to_csv(output_path, mode="a", header=write_header, index=False, encoding="utf-8")
+
+        summary["seconds"] = time.perf_counter() - start
+        summary["last_row"] = chunk[-1][0]
+        if on_progress is not None:
+            on_progress(summary)
+    return summary
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bewertet die Antworten einer CSV- oder XLSX-Datei mit BonsAI_Score.")
+    parser.add_argument("input", help="CSV- oder XLSX-Datei mit den Antworten")
+    parser.add_argument("output", help="CSV-Datei für die Ergebnisse")
+    parser.add_argument("--frage", required=True, help="Frage, auf die sich die Antworten beziehen")
+    parser.add_argument("--column", help="Name oder Nummer (ab 0) der Antwortspalte, Standard: erste Spalte")
+    parser.add_argument("--sheet", help="Tabellenblatt bei XLSX-Dateien, Standard: aktives Blatt")
+    parser.add_argument("--backend", choices=[BACKEND_ASSISTANTS, BACKEND_CHAT, BACKEND_BATCH], default=BACKEND_CHAT)
+    parser.add_argument("--model", help="Modell für Chat- und Batch-Backend, Standard: [openai] model oder Modell des Assistants")
+    parser.add_argument("--prompt-file", help="Datei mit dem System Prompt, Standard: Prompt der Web-App")
+    parser.add_argument("--pack-size", type=int, default=1, help="Antworten pro Anfrage (nur Chat-Backend)")
+    parser.add_argument("--max-workers", type=int, help="Parallele Anfragen, Standard: [scoring] max_workers")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Antworten pro Block; beim Batch-Backend ein Batch-Job pro Datei")
+    parser.add_argument("--no-dedupe", action="store_true", help="Gleiche Antworten nicht zusammenfassen")
+    parser.add_argument("--no-local-rules", action="store_true", help="Auch eindeutige Fälle (leer, Tastaturgeklimper, ...) vom Modell bewerten lassen")
+    parser.add_argument("--no-cache", action="store_true", help="Ergebnis-Cache nicht verwenden")
+    parser.add_argument("--resume", action="store_true", help="Bereits in der Ausgabedatei stehende Zeilen überspringen und fehlgeschlagene erneut bewerten")
+    parser.add_argument("--secrets", default=DEFAULT_SECRETS_PATH, help="Pfad zur secrets.toml der Web-App")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Antwortspalte prüfen, bevor Client, Cache und Ausgabedatei angefasst werden
+    try:
+        _select_column(read_header(args.input, args.sheet), args.column)
+    except (OSError, KeyError, ValueError) as e:
+        sys.exit(f"{args.input}: {e}")
+
+    secrets = load_secrets(args.secrets)
+    openai_config = secrets.get("openai", {})
+    cache_config = secrets.get("cache", {})
+    jobs_config = secrets.get("jobs", {})
+    local_rules_config = secrets.get("local_rules", {})
+
+    client = OpenAI(api_key=openai_config.get("api_key") or os.environ.get("OPENAI_API_KEY"), base_url=openai_config.get("base_url"))
+    assistant_id = secrets.get("assistant", {}).get("id")
+
+    # Anweisungen und Modell des Assistants wie in der Web-App ermitteln
+    assistant_instructions = assistant_model = None
+    if assistant_id:
+        assistant = client.beta.assistants.retrieve(assistant_id=assistant_id)
+        assistant_instructions, assistant_model = assistant.instructions, assistant.model
+    elif args.backend == BACKEND_ASSISTANTS:
+        sys.exit("Für das Assistants-Backend wird [assistant] id in den Secrets benötigt.")
+    model = args.model or openai_config.get("model", assistant_model)
+    if model is None:
+        sys.exit("Kein Modell angegeben: --model oder [openai] model in den Secrets setzen.")
+
+    system_prompt = DEFAULT_SYSTEM_PROMPT
+    if args.prompt_file:
+        with open(args.prompt_file, encoding="utf-8") as file:
+            system_prompt = file.read()
+
+    settings = {
+        "backend": args.backend,
+        "system_prompt": system_prompt,
+        "model": model,
+        "pack_size": args.pack_size if args.backend == BACKEND_CHAT else 1,
+        "max_workers": args.max_workers or int(secrets.get("scoring", {}).get("max_workers", DEFAULT_MAX_WORKERS)),
+        "deduplicate": not args.no_dedupe,
+        "local_rules": not args.no_local_rules and local_rules_config.get("enabled", True),
+        "blocklist": list(local_rules_config.get("blocklist", DEFAULT_BLOCKLIST)),
+        "use_cache": not args.no_cache and cache_config.get("enabled", True),
+        "assistant_instructions": assistant_instructions,
+        "assistant_model": assistant_model,
+    }
+    score_cache = ScoreCache(
+        path=cache_config.get("path", DEFAULT_CACHE_PATH),
+        ttl_days=cache_config.get("ttl_days", DEFAULT_TTL_DAYS),
+        max_entries=cache_config.get("max_entries", DEFAULT_MAX_ENTRIES)
+    )
+    governor = RateGovernor(
+        requests_per_minute=jobs_config.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE),
+        tokens_per_minute=jobs_config.get("tokens_per_minute", DEFAULT_TOKENS_PER_MINUTE)
+    )
+
+    def show_progress(summary):
+        done = summary["processed"] + summary["errors"]
+        print(
+            f"bis Zeile {summary['last_row']}: {done} Antworten | Fehler: {summary['errors']} | "
+            f"Lokal: {summary['local_hits']} | Cache-Treffer: {summary['cache_hits']} | {done / max(summary['seconds'], 1e-9):.1f} Antworten/s",
+            file=sys.stderr
+        )
+
+    summary = score_file(
+        args.input,
+        args.output,
+        args.frage,
+        settings,
+        client,
+        assistant_id=assistant_id,
+        column=args.column,
+        sheet=args.sheet,
+        chunk_size=args.chunk_size,
+        governor=governor,
+        score_cache=score_cache,
+        resume=args.resume,
+        on_progress=show_progress
+    )
+    print(
+        f"Fertig: {summary['processed']} bewertet, {summary['errors']} Fehler, "
+        f"{summary['local_hits']} lokal, {summary['cache_hits']} Cache-Treffer, {summary['requests']:.0f} Modell-Anfragen in {summary['seconds']:.1f} s"
+        + (" | Fehlgeschlagene Antworten fehlen in der Ausgabe, --resume bewertet sie erneut." if summary["errors"] else ""),
+        file=sys.stderr
+    )
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Zerlegung der Codierungen in Score-Spalten und Verteilungsstatistiken.
+
+Die Codierung "Relevanz: 80; Klarheit: 90; ...; Gesamt: 85" wird spaltenweise mit
+pandas-String-Methoden ausgewertet, nicht Zeile für Zeile in Python. Für Experimente
+mit mehreren Prompt-Varianten gibt es Vergleichstabelle und Übereinstimmungsstatistik.
+"""
+import re
+
+import pandas as pd
+
+# Bewertungskriterien in der Reihenfolge der Antwortsyntax
+KRITERIEN = ["Relevanz", "Klarheit", "Detailgrad", "Grammatik und Stil", "Sprache", "Gesamt"]
+
+# Markiert Zeilen, deren Codierung nicht vollständig gelesen werden konnte
+PARSE_FLAG_COLUMN = "Nicht auswertbar"
+
+# Perzentile für die Verteilungsübersicht
+PERZENTILE = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+# Höchster Abstand in Punkten, bei dem zwei Prompt-Varianten als übereinstimmend gelten
+AGREEMENT_TOLERANCE = 10
+
+
+def parse_codierungen(codierungen):
+    """Wandelt eine Series von Codierungen in einen DataFrame mit einer Int8-Spalte pro Kriterium.
+
+    Dezimalwerte (z.B. beim Gesamtwert) werden gerundet, Werte auf 0 bis 100 begrenzt.
+    Fehlende Kriterien bleiben <NA>, die Spalte PARSE_FLAG_COLUMN ist dann True.
+    """
+    texte = codierungen.astype("string")
+    scores = pd.DataFrame(index=codierungen.index)
+    for kriterium in KRITERIEN:
+        # Zusätze wie "Detailgrad und Menschlichkeit:" oder "Gesamtwertung:" sind erlaubt
+        werte = texte.str.extract(rf"{re.escape(kriterium)}[^:;\d]*:\s*(\d+(?:[.,]\d+)?)", expand=False)
+        werte = pd.to_numeric(werte.str.replace(",", ".", regex=False), errors="coerce")
+        scores[kriterium] = werte.round().clip(0, 100).astype("Int8")
+    scores[PARSE_FLAG_COLUMN] = scores[KRITERIEN].isna().any(axis=1)
+    return scores
+
+
+def score_summary(scores):
+    """Verteilungsübersicht pro Kriterium: Anzahl, Mittelwert, Perzentile und Anteil der Nullwerte."""
+    werte = scores[KRITERIEN].astype("Float64")
+    summary = pd.DataFrame({
+        "Anzahl": werte.count(),
+        "Mittelwert": werte.mean(),
+        **{f"P{int(p * 100)}": werte.quantile(p) for p in PERZENTILE},
+        "Anteil 0": werte.eq(0).sum() / werte.count().replace(0, pd.NA),
+    })
+    summary.index.name = "Kriterium"
+    return summary
+
+
+def variant_table(antworten, variant_results):
+    """Antworten mit Codierung und Score-Spalten jeder Prompt-Variante nebeneinander.
+
+    variant_results ist eine Liste von (name, codierungen) in Antwortreihenfolge; die
+    Spalten heißen "<Variante>: Codierung", "<Variante>: Relevanz" usw.
+    """
+    df = pd.DataFrame({"Antwort": antworten})
+    for name, codierungen in variant_results:
+        codierung_column = pd.Series(codierungen, index=df.index, dtype=object)
+        scores = parse_codierungen(codierung_column)
+        df[f"{name}: Codierung"] = codierung_column
+        for kriterium in KRITERIEN:
+            df[f"{name}: {kriterium}"] = scores[kriterium]
+    return df
+
+
+def variant_summary(variant_results, kriterium="Gesamt", toleranz=AGREEMENT_TOLERANCE):
+    """Verteilung eines Kriteriums pro Variante und Übereinstimmung mit der ersten Variante.
+
+    Verglichen werden nur Antworten, die beide Varianten auswerten konnten: Anteil der
+    Scores mit höchstens toleranz Punkten Abstand, mittlere absolute Abweichung und
+    Rangkorrelation nach Spearman.
+    """
+    werte = {
+        name: parse_codierungen(pd.Series(codierungen, dtype=object))[kriterium].astype("Float64")
+        for name, codierungen in variant_results
+    }
+    referenz = next(iter(werte.values()))
+    rows = {}
+    for name, variante in werte.items():
+        beide = referenz.notna() & variante.notna()
+        abweichung = (variante[beide] - referenz[beide]).abs()
+        rows[name] = {
+            "Anzahl": variante.count(),
+            "Mittelwert": variante.mean(),
+            **{f"P{int(p * 100)}": variante.quantile(p) for p in PERZENTILE},
+            "Anteil 0": variante.eq(0).sum() / variante.count() if variante.count() else pd.NA,
+            f"Übereinstimmung ±{toleranz}": abweichung.le(toleranz).mean() if beide.any() else pd.NA,
+            "Mittl. Abweichung": abweichung.mean() if beide.any() else pd.NA,
+            "Rangkorrelation": _rank_correlation(variante[beide], referenz[beide]),
+        }
+    summary = pd.DataFrame.from_dict(rows, orient="index")
+    summary.index.name = "Variante"
+    return summary
+
+
+def _rank_correlation(a, b):
+    """Spearman als Pearson-Korrelation der Ränge, ohne scipy; <NA>, wenn eine Seite konstant ist."""
+    if a.nunique() < 2 or b.nunique() < 2:
+        return pd.NA
+    return a.rank().astype(float).corr(b.rank().astype(float))
@@ -0,0 +1,486 @@
+"""Scoring-Kern von BonsAI_Score.
+
+Enthält die Bewertung einzelner Antworten über die OpenAI Assistants API bzw. über
+zustandslose Chat-Completions-Aufrufe und die parallele Verarbeitung ganzer
+Nennungen-Listen. Das Modul greift bewusst nicht auf
+st.session_state zu, damit die Funktionen auch in Worker-Threads laufen können.
+"""
+import concurrent.futures
+import re
+import threading
+import time
+import unicodedata
+
+from rate_limit import RETRYABLE_RUN_ERRORS, call_with_retries, estimate_tokens
+
+# Verfügbare Scoring-Backends
+BACKEND_ASSISTANTS = "assistants"
+BACKEND_CHAT = "chat"
+
+# Standardwerte für die parallele Verarbeitung
+DEFAULT_MAX_WORKERS = 8
+MAX_MESSAGES_PER_THREAD = 40
+
+# Grenzen für das Bündeln mehrerer Antworten in einer Anfrage
+DEFAULT_PACK_SIZE = 25
+DEFAULT_MAX_PACK_CHARS = 6000
+
+# Standard-System-Prompt für die Bewertung (Web-App und Kommandozeile)
+DEFAULT_SYSTEM_PROMPT = """Als Sprachassistent bist du darauf spezialisiert, die Qualität von offenen Antworten in Onlineumfragen zu bewerten.
+
+**Eingabeformat**
+Du erhältst die Eingabe in folgendem Format:
+Frage: [Die gestellte Frage]
+Antwort: [Die zu bewertende Antwort]
+
+**Bewertungskriterien**
+
+1. **Relevanz**: 
+   - Bewertet die inhaltliche Passung zur Frage (0-100)
+   - Bei komplett irrelevanter Antwort = 0
+
+2. **Klarheit**: 
+   - Bewertet Verständlichkeit und Struktur (0-100)
+   - Auch bei irrelevanter Antwort die tatsächliche Klarheit bewerten
+
+3. **Detailgrad und Menschlichkeit**: 
+   - Bewertet Informationsgehalt und Vollständigkeit (0-100)
+    - Bewertungsrichtlinien:
+      *WICHTIG: Eine Einwortantwort ist oft besser als eine lange, ausschweifende Antwort
+      *Wenn eine kurze oder Einwortantwort relevant ist, dann sollte der Score 80-100 sein
+       *0 Punkte vergeben bei Lexikon-artigen Erklärungen
+
+4. **Grammatik und Stil**: 
+   - Bewertet sprachliche Korrektheit (0-100)
+   - Unabhängig von Relevanz oder Detailgrad bewerten
+
+5. **Sprache**:
+   - Wenn die Frage Frage und die Antwort auf verschieden Sprachen sind, z.B. Frage auf Deutsch und Antwort auf Englisch: 
+     * Sprache = 0, sonst 100
+     * Wenn Sprache = 0, dann setze alle Scores=0
+     * Bei Nonsense = 0
+
+**Gesamtwertung**:
+- Mathematischer Durchschnitt aller fünf Kriterien
+
+# Antwortsyntax (NUR DIESE ZEILE AUSGEBEN)
+Relevanz: [Zahl]; Klarheit: [Zahl]; Detailgrad: [Zahl]; Grammatik und Stil: [Zahl]; Sprache: [Zahl];Gesamt: [Zahl]"""
+
+# Zusatzanweisung für gebündelte Anfragen, wird an den System Prompt angehängt
+PACKED_INSTRUCTIONS = """**Mehrere Antworten**
+Du erhältst mehrere nummerierte Antworten auf dieselbe Frage. Bewerte jede Antwort unabhängig von den anderen.
+Gib für jede Antwort genau eine Zeile in derselben Reihenfolge aus, ohne weiteren Text:
+[Nummer]: Relevanz: [Zahl]; Klarheit: [Zahl]; Detailgrad: [Zahl]; Grammatik und Stil: [Zahl]; Sprache: [Zahl];Gesamt: [Zahl]"""
+
+# Kriterien einer Codierung in der Reihenfolge der Antwortsyntax
+_CODIERUNG_KRITERIEN = ["Relevanz", "Klarheit", "Detailgrad", "Grammatik und Stil", "Sprache", "Gesamt"]
+
+# Beginn eines Eintrags einer gebündelten Antwort, z.B. "3: Relevanz: ..."
+_PACKED_ENTRY_PATTERN = re.compile(r"^\D*?(\d+)\D*?Relevanz", re.IGNORECASE)
+
+# Ein vollständiger Eintrag, z.B. "3: Relevanz: 80; ...; Gesamt: 75": alle sechs Kriterien
+# in der Reihenfolge der Antwortsyntax und danach nichts mehr in der Zeile. Zwei Einträge
+# in einer Zeile oder fehlende Kriterien passen damit nicht.
+_PACKED_LINE_PATTERN = re.compile(
+    r"^\D*?(\d+)\D*?("
+    + r"\s*;\s*".join(rf"{re.escape(kriterium)}[^:;\d]*:\s*\d+(?:[.,]\d+)?" for kriterium in _CODIERUNG_KRITERIEN)
+    + r")[\s.;]*$",
+    re.IGNORECASE
+)
+
+# Zustand pro Worker-Thread (jeder Worker hat seine eigenen Assistants-Threads)
+_worker_state = threading.local()
+
+
+class ScoringError(Exception):
+    """Wird ausgelöst, wenn eine Antwort auch nach allen Wiederholungen nicht bewertet werden konnte.
+
+    attempts und status (z.B. der letzte Run-Status) fließen in die Telemetrie ein.
+    retryable markiert Fehler eines einzelnen Versuchs, die eine Wiederholung lohnen.
+    """
+
+    def __init__(self, message, attempts=None, status=None, retryable=False):
+        super().__init__(message)
+        self.attempts = attempts
+        self.status = status
+        self.retryable = retryable
+
+
+def build_message_content(frage, antwort):
+    """Baut die Nachricht, die für eine Antwort an den Assistant gesendet wird."""
+    return f"Zu bewertende Frage: {frage}. Zu bewertende Antwort: {antwort}"
+
+
+def normalize_antwort(antwort):
+    """Vereinheitlicht Unicode-Form, Groß-/Kleinschreibung, Satzzeichen und Leerraum.
+
+    Antworten, die nur aus Satzzeichen bestehen, behalten ihre Zeichen, damit z.B.
+    "-" und "?" nicht zusammenfallen.
+    """
+    text = unicodedata.normalize("NFKC", antwort).casefold()
+    text = "".join(" " if unicodedata.category(zeichen).startswith("P") else zeichen for zeichen in text)
+    return " ".join(text.split()) or " ".join(antwort.split())
+
+
+def group_antworten(antworten, normalize=normalize_antwort):
+    """Fasst gleiche Antworten zusammen.
+
+    Gibt (eindeutige_antworten, gruppen) zurück: eindeutige_antworten enthält das erste
+    Vorkommen jeder Gruppe in Eingabereihenfolge, gruppen[i] die Indizes aller
+    Antworten in antworten, die zu eindeutige_antworten[i] gehören.
+    """
+    eindeutige_antworten = []
+    gruppen = []
+    gruppe_fuer = {}
+    for index, antwort in enumerate(antworten):
+        schluessel = normalize(antwort)
+        if schluessel not in gruppe_fuer:
+            gruppe_fuer[schluessel] = len(eindeutige_antworten)
+            eindeutige_antworten.append(antwort)
+            gruppen.append([])
+        gruppen[gruppe_fuer[schluessel]].append(index)
+    return eindeutige_antworten, gruppen
+
+
+def usage_tokens(usage):
+    """Liest Prompt- und Completion-Tokens aus einem Usage-Objekt der API (falls vorhanden)."""
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+
+
+def get_worker_thread_id(client, max_messages=MAX_MESSAGES_PER_THREAD, key=None):
+    """Gibt den Thread des aktuellen Workers für key zurück und erstellt bei Bedarf einen neuen.
+
+    Parallele Runs auf demselben Thread sind nicht möglich, deshalb verwaltet jeder
+    Worker seine eigenen Threads. key trennt die Verläufe von Runs mit verschiedenen
+    Anweisungen (z.B. die Prompt-Varianten eines Experiments im gemeinsamen Pool), damit
+    ein Run nicht die Bewertungen einer anderen Variante im Verlauf sieht. Nach
+    max_messages Anfragen wird ein frischer Thread angelegt, damit der Verlauf nicht
+    unbegrenzt wächst.
+    """
+    threads = getattr(_worker_state, "threads", None)
+    if threads is None:
+        threads = _worker_state.threads = {}
+    thread_id, messages_processed = threads.get(key, (None, 0))
+    if thread_id is None or messages_processed >= max_messages:
+        thread_id, messages_processed = client.beta.threads.create().id, 0
+
+    threads[key] = (thread_id, messages_processed + 1)
+    return thread_id
+
+
+# Funktion zur Analyse einer Frage mit OpenAI Assistants API
+def analyze_question(frage, antwort, client, assistant_id, thread_id=None, max_retries=3, retry_delay=2, governor=None, expected_tokens=None, run_instructions=None):
+    """Bewertet eine Antwort über einen Assistants-Run.
+
+    Ohne thread_id wird der Thread des aktuellen Workers verwendet. Gibt ein Dict mit
+    codierung, prompt_tokens, completion_tokens sowie für die Telemetrie attempts,
+    status und polling_time (Wartezeit auf den Run) zurück und löst ScoringError aus,
+    wenn alle Versuche fehlschlagen. Ist ein governor (rate_limit.RateGovernor)
+    angegeben, wartet jeder Versuch auf dessen Freigabe für expected_tokens Tokens.
+    run_instructions ersetzt die Anweisungen des Assistants nur für diesen Run.
+    """
+    message_content = build_message_content(frage, antwort)
+    run_options = {"instructions": run_instructions} if run_instructions else {}
+
+    def request():
+        run_thread_id = thread_id or get_worker_thread_id(client, key=run_instructions)
+
+        # Nachricht zum Thread hinzufügen, die Header melden das aktuelle Kontingent
+        raw = client.beta.threads.messages.with_raw_response.create(
+            thread_id=run_thread_id,
+            role="user",
+            content=message_content
+        )
+        if governor is not None:
+            governor.observe_headers(raw.headers)
+
+        # Run erstellen und auf Abschluss warten
+        poll_start = time.perf_counter()
+        run = client.beta.threads.runs.create_and_poll(
+            thread_id=run_thread_id,
+            assistant_id=assistant_id,
+            **run_options
+        )
+        polling_time = time.perf_counter() - poll_start
+
+        if run.status == 'failed':
+            # Nur Runs, die am Rate Limit oder an einem Serverfehler gescheitert sind, lohnen eine Wiederholung
+            last_error = getattr(run, "last_error", None)
+            code = getattr(last_error, "code", None)
+            raise ScoringError(f"Run-Status ist {run.status}" + (f" ({code})" if code else ""), status=run.status, retryable=code in RETRYABLE_RUN_ERRORS)
+        if run.status != 'completed':
+            raise ScoringError(f"Unerwarteter Run-Status: {run.status}", status=run.status)
+
+        # Antwort abrufen
+        messages = client.beta.threads.messages.list(
+            thread_id=run_thread_id
+        )
+
+        prompt_tokens, completion_tokens = usage_tokens(getattr(run, "usage", None))
+        codierung = "Keine Antwort vom Assistenten erhalten"
+
+        # Die neueste Assistenten-Nachricht zurückgeben
+        for message in messages.data:
+            if message.role == "assistant":
+                codierung = message.content[0].text.value.strip()
+                break
+
+        return {
+            "codierung": codierung,
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "status": run.status,
+            "polling_time": polling_time,
+        }
+
+    tokens = expected_tokens if expected_tokens is not None else estimate_tokens(message_content)
+    return _with_retries(request, governor, tokens, max_retries, retry_delay)
+
+
+def _chat_completion(client, model, messages, governor=None):
+    """Chat-Completions-Aufruf, dessen Rate-Limit-Header an den Governor gemeldet werden."""
+    raw = client.chat.completions.with_raw_response.create(model=model, messages=messages)
+    if governor is not None:
+        governor.observe_headers(raw.headers)
+    return raw.parse()
+
+
+def _with_retries(request, governor, tokens, max_retries, retry_delay):
+    """Führt request() über rate_limit.call_with_retries aus und ergänzt attempts im Ergebnis-Dict.
+
+    Schlägt der letzte Versuch fehl oder ist der Fehler nicht wiederholbar, wird
+    ScoringError mit Anzahl der Versuche und Status ausgelöst.
+    """
+    try:
+        result, attempts = call_with_retries(request, governor, tokens, max_retries, retry_delay)
+    except Exception as e:
+        attempts = getattr(e, "attempts", None)
+        raise ScoringError(f"Fehler nach {attempts} Versuchen: {str(e)}", attempts=attempts, status=getattr(e, "status", None)) from e
+    result["attempts"] = attempts
+    return result
+
+
+# Funktion zur Analyse einer Frage mit einem einzelnen Chat-Completions-Aufruf
+def analyze_question_stateless(frage, antwort, client, model, instructions, max_retries=3, retry_delay=2, governor=None):
+    """Bewertet eine Antwort mit genau einer Anfrage, ohne Thread und ohne Verlauf.
+
+    Der System Prompt wird bei jeder Anfrage mitgeschickt. Rückgabe und Fehlerverhalten
+    entsprechen analyze_question.
+    """
+    message_content = build_message_content(frage, antwort)
+
+    def request():
+        response = _chat_completion(client, model, [
+            {"role": "system", "content": instructions},
+            {"role": "user", "content": message_content}
+        ], governor)
+        prompt_tokens, completion_tokens = usage_tokens(response.usage)
+        codierung = (response.choices[0].message.content or "").strip() or "Keine Antwort vom Modell erhalten"
+        return {"codierung": codierung, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "status": "completed"}
+
+    return _with_retries(request, governor, estimate_tokens(instructions, message_content), max_retries, retry_delay)
+
+
+# Funktion zur Analyse mehrerer Antworten mit einem einzigen Chat-Completions-Aufruf
+def analyze_packed(frage, antworten, client, model, instructions, max_retries=3, retry_delay=2, governor=None):
+    """Bewertet mehrere Antworten auf dieselbe Frage mit einer einzigen Anfrage.
+
+    Gibt eine Liste von Ergebnis-Dicts in der Reihenfolge von antworten zurück. Antworten,
+    deren Zeile fehlt, doppelt vorkommt oder nicht sicher zuzuordnen ist, werden einzeln
+    mit analyze_question_stateless nachbewertet. Schlägt auch das fehl, steht an ihrer
+    Stelle die ScoringError-Exception.
+    """
+    codierungen = [None] * len(antworten)
+    prompt_tokens, completion_tokens = None, None
+    system_content = f"{instructions}\n\n{PACKED_INSTRUCTIONS}"
+    message_content = build_packed_message_content(frage, antworten)
+
+    def request():
+        return _chat_completion(client, model, [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": message_content}
+        ], governor)
+
+    try:
+        response, attempts = call_with_retries(request, governor, estimate_tokens(system_content, message_content), max_retries, retry_delay)
+        prompt_tokens, completion_tokens = usage_tokens(response.usage)
+        codierungen = parse_packed_response(response.choices[0].message.content or "", len(antworten))
+    except Exception as e:
+        # Nach dem letzten Versuch werden alle Antworten einzeln bewertet
+        attempts = getattr(e, "attempts", max_retries)
+
+    # Token-Verbrauch und Anfrage der gebündelten Anfrage gleichmäßig auf das Paket verteilen
+    share = 1 / len(antworten)
+    results = []
+    for antwort, codierung in zip(antworten, codierungen):
+        result = {
+            "codierung": codierung,
+            "prompt_tokens": (prompt_tokens or 0) * share,
+            "completion_tokens": (completion_tokens or 0) * share,
+            "requests": share,
+            "attempts": attempts,
+            "status": "completed",
+        }
+        if codierung is None:
+            try:
+                einzeln = analyze_question_stateless(frage, antwort, client, model, instructions, max_retries, retry_delay, governor)
+            except ScoringError as e:
+                results.append(e)
+                continue
+            result["codierung"] = einzeln["codierung"]
+            result["prompt_tokens"] += einzeln["prompt_tokens"] or 0
+            result["completion_tokens"] += einzeln["completion_tokens"] or 0
+            result["requests"] += 1
+            result["attempts"] += einzeln["attempts"]
+        results.append(result)
+    return results
+
+
+def build_packed_message_content(frage, antworten):
+    """Baut die Nachricht mit allen nummerierten Antworten eines Pakets."""
+    zeilen = "\n".join(f"{nummer}: {' '.join(antwort.split())}" for nummer, antwort in enumerate(antworten, 1))
+    return f"Zu bewertende Frage: {frage}.\nZu bewertende Antworten:\n{zeilen}"
+
+
+def parse_packed_response(text, count):
+    """Ordnet die Zeilen einer gebündelten Antwort den Antworten 1 bis count zu.
+
+    Zeilen werden nur übernommen, solange die Nummerierung lückenlos bei 1 beginnt und
+    aufsteigt. Ab der ersten Lücke, Dopplung oder Vertauschung ist die Zuordnung unsicher,
+    die restlichen Einträge bleiben None und werden einzeln nachbewertet. Ein Eintrag,
+    dem Kriterien fehlen oder hinter dem in derselben Zeile noch etwas folgt (z.B. ein
+    zweiter Eintrag), bleibt ebenfalls None.
+    """
+    codierungen = [None] * count
+    expected = 1
+    for line in text.splitlines():
+        entry = _PACKED_ENTRY_PATTERN.match(line)
+        if not entry:
+            continue
+        if expected > count or int(entry.group(1)) != expected:
+            break
+        match = _PACKED_LINE_PATTERN.match(line)
+        if match:
+            codierungen[expected - 1] = match.group(2).strip()
+        expected += 1
+    return codierungen
+
+
+def pack_antworten(antworten, max_count, max_chars=DEFAULT_MAX_PACK_CHARS):
+    """Teilt die Indizes der Antworten in Pakete mit höchstens max_count Antworten und max_chars Zeichen."""
+    packs = []
+    current, current_chars = [], 0
+    for index, antwort in enumerate(antworten):
+        if current and (len(current) >= max_count or current_chars + len(antwort) > max_chars):
+            packs.append(current)
+            current, current_chars = [], 0
+        current.append(index)
+        current_chars += len(antwort)
+    if current:
+        packs.append(current)
+    return packs
+
+
+def make_scorer(client, backend=BACKEND_ASSISTANTS, assistant_id=None, model=None, instructions=None, packed=False, governor=None, run_instructions=None):
+    """Gibt eine Funktion scorer(frage, antworten) für das gewählte Backend zurück.
+
+    Der Scorer bewertet eine Liste von Antworten und gibt eine gleich lange Liste von
+    Ergebnis-Dicts (oder Exceptions für einzelne Antworten) zurück. Mit packed=True
+    werden die Antworten beim zustandslosen Backend in einer Anfrage gebündelt. Ist ein
+    governor (rate_limit.RateGovernor) angegeben, wartet jeder Versuch auf dessen Freigabe.
+    run_instructions gibt beim Assistants-Backend jedem Run eigene Anweisungen mit, ohne
+    den gemeinsamen Assistant zu ändern.
+    """
+    # Wiederholungen übernimmt call_with_retries; die eingebauten des SDK würden
+    # Governor, Retry-After-Pausen und Circuit Breaker umgehen
+    client = client.with_options(max_retries=0)
+
+    if backend == BACKEND_ASSISTANTS:
+        def score_one(frage, antwort):
+            return analyze_question(frage, antwort, client, assistant_id, governor=governor,
+                                    expected_tokens=estimate_tokens(instructions, frage, antwort),
+                                    run_instructions=run_instructions)
+    elif backend == BACKEND_CHAT:
+        if packed:
+            def score_pack(frage, antworten):
+                return analyze_packed(frage, antworten, client, model, instructions, governor=governor)
+            return score_pack
+
+        def score_one(frage, antwort):
+            return analyze_question_stateless(frage, antwort, client, model, instructions, governor=governor)
+    else:
+        raise ValueError(f"Unbekanntes Scoring-Backend: {backend}")
+    return lambda frage, antworten: [score_one(frage, antwort) for antwort in antworten]
+
+
+def error_result(fehler, queue_time=None):
+    """Ergebnis-Dict für eine Antwort, die nicht bewertet werden konnte."""
+    return {
+        "codierung": f"FEHLER: {str(fehler)}",
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "requests": 0,
+        "latency": None,
+        "attempts": getattr(fehler, "attempts", None),
+        "status": getattr(fehler, "status", None) or "failed",
+        "queue_time": queue_time,
+    }
+
+
+def _timed_call(scorer, frage, antworten, submitted):
+    """Ruft den Scorer für ein Paket auf und verteilt die Latenz gleichmäßig auf dessen Antworten.
+
+    queue_time ist die Wartezeit zwischen Einreichen in den Pool und Start des Workers.
+    """
+    start = time.perf_counter()
+    results = scorer(frage, antworten)
+    latency = (time.perf_counter() - start) / len(antworten)
+    for result in results:
+        if isinstance(result, dict):
+            result["latency"] = latency
+            result["queue_time"] = start - submitted
+            result.setdefault("requests", 1)
+        elif isinstance(result, Exception):
+            result.queue_time = start - submitted
+    return results
+
+
+def score_antworten(frage, antworten, scorer, max_workers=DEFAULT_MAX_WORKERS, pack_size=1, max_pack_chars=DEFAULT_MAX_PACK_CHARS, executor=None):
+    """Bewertet alle Antworten mit einem begrenzten Pool von Worker-Threads.
+
+    Jeder Worker erhält ein Paket aus höchstens pack_size Antworten (Standard: einzeln).
+    Liefert Tupel (index, result, fehler) in der Reihenfolge der Fertigstellung;
+    über den Index lassen sich die Ergebnisse wieder in Eingabereihenfolge bringen.
+    result ist das Dict des Scorers inklusive latency und requests. fehler ist None
+    oder die aufgetretene Exception, result["codierung"] enthält dann den Fehlertext.
+    Mit executor teilen sich mehrere Aufrufe (z.B. mehrere Fragen) einen gemeinsamen Pool.
+    """
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_workers))
+    futures = {}
+    try:
+        futures = {
+            executor.submit(_timed_call, scorer, frage, [antworten[index] for index in pack], time.perf_counter()): pack
+            for pack in pack_antworten(antworten, pack_size, max_pack_chars)
+        }
+        for future in concurrent.futures.as_completed(futures):
+            pack = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [e] * len(pack)
+            for index, result in zip(pack, results):
+                if isinstance(result, Exception):
+                    yield index, error_result(result, getattr(result, "queue_time", None)), result
+                else:
+                    yield index, result, None
+    finally:
+        # Bei Abbruch (z.B. Streamlit-Rerun) noch nicht gestartete Anfragen verwerfen
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+        else:
+            for future in futures:
+                future.cancel()
@@ -0,0 +1,126 @@
+"""Begrenzte Telemetrie der Modell-Aufrufe eines Jobs.
+
+Statt für jede Antwort den kompletten System Prompt zu speichern, wird pro Aufruf ein
+kleiner strukturierter Datensatz in einen Ringpuffer fester Größe geschrieben. Die
+Zähler für Aufrufe und Fehler laufen über den ganzen Job, die Latenz-Perzentile
+beziehen sich auf die zuletzt gespeicherten Datensätze. Intern ist ein Datensatz ein
+Tupel in der Reihenfolge von TRACE_FIELDS, als Dict wird er erst beim Auslesen gebaut.
+Mit einem Pfad wird zusätzlich jeder Datensatz sofort als JSONL-Zeile in eine Datei
+geschrieben; der Export enthält dann alle Aufrufe des Jobs, nicht nur die letzten.
+"""
+import collections
+import json
+import math
+import os
+import threading
+import time
+
+# Anzahl der Datensätze, die pro Job höchstens aufbewahrt werden
+DEFAULT_TRACE_SIZE = 2000
+
+# Felder eines Datensatzes in Anzeigereihenfolge
+TRACE_FIELDS = [
+    "timestamp", "job_id", "answer_id", "status", "attempts", "queue_time",
+    "polling_time", "latency", "prompt_tokens", "completion_tokens", "cached",
+]
+
+
+def percentile(values, p):
+    """Perzentil nach dem Nearest-Rank-Verfahren; None, wenn keine Werte vorliegen."""
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return None
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+class CallTrace:
+    """Threadsicherer Ringpuffer für Aufruf-Datensätze, optional mit vollständiger JSONL-Datei unter path."""
+
+    def __init__(self, maxlen=DEFAULT_TRACE_SIZE, path=None):
+        self._records = collections.deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._file = None
+        self.path = path
+        self.total_count = 0
+        self.error_count = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    def record(self, job_id, answer_id, result, fehler=None):
+        """Speichert einen Datensatz zum Ergebnis-Dict einer Antwort (siehe scoring.score_antworten)."""
+        # Ein Tupel braucht etwa halb so viel Speicher wie ein Dict mit denselben Feldern
+        entry = (
+            time.time(),
+            job_id,
+            answer_id,
+            "cached" if result.get("cached") else result.get("status") or ("failed" if fehler else "completed"),
+            result.get("attempts"),
+            result.get("queue_time"),
+            result.get("polling_time"),
+            result.get("latency"),
+            result.get("prompt_tokens"),
+            result.get("completion_tokens"),
+            bool(result.get("cached")),
+            None if fehler is None else str(fehler),
+        )
+        with self._lock:
+            self._records.append(entry)
+            self.total_count += 1
+            if fehler is not None:
+                self.error_count += 1
+            if self.path is not None:
+                if self._file is None:
+                    self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+                self._file.write(json.dumps(self._as_dict(entry), ensure_ascii=False) + "\n")
+
+    def close(self):
+        """Schließt die JSONL-Datei; weitere Datensätze öffnen sie wieder zum Anhängen."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def _as_dict(entry):
+        record = dict(zip(TRACE_FIELDS, entry))
+        if entry[-1] is not None:
+            record["error"] = entry[-1]
+        return record
+
+    def records(self):
+        with self._lock:
+            entries = list(self._records)
+        return [self._as_dict(entry) for entry in entries]
+
+    def page(self, number, size):
+        """Datensätze einer Seite (ab 1), der neueste zuerst."""
+        with self._lock:
+            entries = list(reversed(self._records))
+        return [self._as_dict(entry) for entry in entries[(number - 1) * size:number * size]]
+
+    def summary(self):
+        """Kennzahlen: Anzahl, Fehlerquote und p50/p95/p99 von Latenz und Wartezeit der Live-Aufrufe."""
+        records = [record for record in self.records() if not record["cached"]]
+        latencies = [record["latency"] for record in records]
+        queue_times = [record["queue_time"] for record in records]
+        return {
+            "calls": self.total_count,
+            "errors": self.error_count,
+            "error_rate": self.error_count / self.total_count if self.total_count else 0.0,
+            **{f"latency_p{p}": percentile(latencies, p) for p in (50, 95, 99)},
+            **{f"queue_p{p}": percentile(queue_times, p) for p in (50, 95, 99)},
+        }
+
+    def to_jsonl(self):
+        """Datensätze als JSONL-Bytes für die Auswertung außerhalb der App.
+
+        Mit Datei alle Aufrufe des Jobs, sonst nur die im Ringpuffer gespeicherten.
+        """
+        if self.path is not None and os.path.exists(self.path):
+            with self._lock:
+                if self._file is not None:
+                    self._file.flush()
+                with open(self.path, "rb") as file:
+                    return file.read()
+        return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in self.records()).encode("utf-8")
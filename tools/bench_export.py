@@ -0,0 +1,63 @@
+"""Mikro-Benchmark: XLSX-Export mit pd.ExcelWriter gegenüber openpyxl im Write-only-Modus.
+
+Misst zusätzlich CSV und Parquet für dieselbe Ergebnistabelle mit Score-Spalten.
+
+Start:
+    python tools/bench_export.py [anzahl ...]
+"""
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from export import csv_bytes, parquet_bytes, xlsx_bytes  # noqa: E402
+from score_stats import parse_codierungen, score_summary  # noqa: E402
+
+CODIERUNG = "Relevanz: 80; Klarheit: 90; Detailgrad: 70; Grammatik und Stil: 85; Sprache: 100;Gesamt: 85"
+
+
+def excel_writer(score_table, score_stats):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        score_table.to_excel(writer, sheet_name="Ergebnisse", index=False)
+        score_stats.to_excel(writer, sheet_name="Statistik")
+    return buffer.getvalue()
+
+
+def measure(function, *args):
+    # Zeit und Speicher in getrennten Läufen messen, tracemalloc verlangsamt stark
+    start = time.perf_counter()
+    data = function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, len(data) / 2**10
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2500, 25000]
+    print(f"{'Antworten':>10} {'Format':<22} {'Zeit (s)':>9} {'Peak (MiB)':>11} {'Größe (KiB)':>12}")
+    for size in sizes:
+        results = pd.DataFrame({"Antwort": [f"Antwort Nummer {index}" for index in range(size)], "Codierung": [CODIERUNG] * size})
+        scores = parse_codierungen(results["Codierung"])
+        score_table, score_stats = pd.concat([results, scores], axis=1), score_summary(scores)
+        runs = [
+            ("XLSX pd.ExcelWriter", excel_writer, score_table, score_stats),
+            ("XLSX write-only", lambda: xlsx_bytes([("Ergebnisse", score_table, False), ("Statistik", score_stats, True)])),
+            ("CSV", csv_bytes, score_table),
+            ("Parquet", parquet_bytes, score_table),
+        ]
+        for name, function, *args in runs:
+            elapsed, peak, kib = measure(function, *args)
+            print(f"{size:>10} {name:<22} {elapsed:>9.2f} {peak:>11.1f} {kib:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Benchmark: Dauer eines Streamlit-Reruns der Web-App gegen den Mock-Server.
+
+Startet tools/mock_openai_server.py mit künstlicher Latenz pro HTTP-Anfrage, führt
+main.py mit streamlit.testing.AppTest aus und misst die Dauer wiederholter Reruns,
+wie sie bei jeder Widget-Interaktion entstehen. Mit --app lässt sich eine ältere
+Fassung von main.py (z.B. aus einem git worktree) zum Vergleich messen.
+
+Start:
+    python tools/bench_rerun.py [--latency 0.1] [--reruns 20] [--app pfad/zu/main.py]
+"""
+import argparse
+import os
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from mock_openai_server import spawn
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default=os.path.join(REPO_DIR, "main.py"))
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency", type=float, default=0.1, help="Latenz pro HTTP-Anfrage des Mock-Servers in Sekunden")
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    server = spawn(args.port, "--latency", args.latency)
+    try:
+        app = AppTest.from_file(args.app, default_timeout=60)
+        app.secrets["openai"] = {"api_key": "test", "base_url": f"http://127.0.0.1:{args.port}/v1"}
+        app.secrets["assistant"] = {"id": "asst_bench"}
+        app.secrets["users"] = {"bench": "bench"}
+        app.session_state["password_correct"] = True
+
+        start = time.perf_counter()
+        app.run()
+        first = time.perf_counter() - start
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+
+        durations = []
+        for _ in range(args.reruns):
+            start = time.perf_counter()
+            app.run()
+            durations.append(time.perf_counter() - start)
+    finally:
+        server.terminate()
+
+    print(f"App: {args.app} | Latenz pro HTTP-Anfrage: {args.latency * 1000:.0f} ms")
+    print(f"Erster Lauf:      {first * 1000:8.1f} ms")
+    print(f"Rerun Median:     {statistics.median(durations) * 1000:8.1f} ms")
+    print(f"Rerun Maximum:    {max(durations) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Mikro-Benchmark: Ergebnisspeicher gegenüber wiederholtem pd.concat und CSV-Checkpoint.
+
+Simuliert die Buchführung eines Bewertungslaufs ohne API-Aufrufe:
+- alt: alle 10 Antworten pd.concat auf den gesamten DataFrame, alle 20 Antworten
+  den gesamten DataFrame als CSV-String speichern
+- neu: ResultStore.record pro Antwort, am Ende einmal die ResultTable der Sitzung
+  aus dem abgeschlossenen Journal bauen
+Beide Varianten schreiben jede Antwort ins Job-Journal (in ein temporäres Verzeichnis),
+die Zeiten enthalten also dieselben Schreibkosten.
+
+Start:
+    python tools/bench_result_store.py [anzahl ...]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_journal import JobJournal, load_job_results  # noqa: E402
+from result_store import RESULT_COLUMNS, ResultStore, ResultTable  # noqa: E402
+
+CODIERUNG = "Relevanz: 80; Klarheit: 90; Detailgrad: 70; Grammatik und Stil: 85; Sprache: 100;Gesamt: 85"
+
+
+def run_old(antworten, directory):
+    journal = JobJournal.create(directory, "Frage", antworten, {})
+    results_df = pd.DataFrame(columns=RESULT_COLUMNS)
+    batch_results = []
+    for count, antwort in enumerate(antworten, 1):
+        journal.record(count - 1, CODIERUNG)
+        batch_results.append({"Antwort": antwort, "Codierung": CODIERUNG})
+        if len(batch_results) >= 10 or count == len(antworten):
+            results_df = pd.concat([results_df, pd.DataFrame(batch_results)], ignore_index=True)
+            batch_results = []
+        if count % 20 == 0 or count == len(antworten):
+            csv_buffer = io.StringIO()
+            results_df.to_csv(csv_buffer, index=False)
+            csv_buffer.getvalue()
+    journal.complete()
+    return results_df
+
+
+def run_new(antworten, directory):
+    journal = JobJournal.create(directory, "Frage", antworten, {})
+    store = ResultStore(antworten)
+    for index in range(len(antworten)):
+        store.record(index, CODIERUNG)
+        journal.record(index, CODIERUNG)
+    journal.complete()
+    # Der beendete Job gibt seine Listen frei, die Sitzung liest das abgeschlossene Journal
+    return ResultTable(*load_job_results(directory, journal.job_id)).to_dataframe()
+
+
+def measure(function, antworten):
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as directory:
+        df = function(antworten, directory)
+    elapsed = time.perf_counter() - start
+    assert len(df) == len(antworten)
+    return elapsed
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [2500, 25000]
+    print(f"{'Antworten':>10} {'alt (s)':>10} {'neu (s)':>10} {'Faktor':>8}")
+    for size in sizes:
+        antworten = [f"Antwort Nummer {index}" for index in range(size)]
+        old = measure(run_old, antworten)
+        new = measure(run_new, antworten)
+        print(f"{size:>10} {old:>10.2f} {new:>10.2f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
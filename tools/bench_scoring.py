@@ -0,0 +1,169 @@
+"""Benchmark: Bewertung ganzer Jobs gegen den Mock-Server, ohne API-Kosten.
+
+Startet tools/mock_openai_server.py mit einstellbarer Latenz, Run-Dauer, Fehlerquote und
+Rate Limit und bewertet Jobs verschiedener Größe auf zwei Ebenen:
+- antworten: der Scorer aus scoring.make_scorer mit scoring.score_antworten
+  (analyze_question, analyze_question_stateless bzw. analyze_packed),
+- job: der ganze Ablauf aus job_manager.run_job mit Deduplizierung, Journal und
+  Ergebnisspeicher, wie ihn die Web-App im Hintergrund ausführt.
+Ausgegeben werden Antworten pro Sekunde, p50/p99 der Latenz pro Antwort,
+HTTP-Anfragen pro Antwort, Fehler und der Speicher-Peak (tracemalloc).
+
+Start:
+    python tools/bench_scoring.py [--sizes 100 500 2500] [--backends assistants chat packed]
+        [--latency 0.02] [--latency-distribution lognormal] [--run-time 0.2]
+        [--error-rate 0.01] [--run-failure-rate 0.01] [--requests-per-minute 6000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+from openai import OpenAI
+
+from mock_openai_server import LATENCY_DISTRIBUTIONS, spawn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_journal import JobJournal  # noqa: E402
+from job_manager import ScoringJob, run_job  # noqa: E402
+from rate_limit import RateGovernor  # noqa: E402
+from scoring import BACKEND_ASSISTANTS, BACKEND_CHAT, DEFAULT_MAX_WORKERS, DEFAULT_PACK_SIZE, DEFAULT_SYSTEM_PROMPT, make_scorer, score_antworten  # noqa: E402
+from telemetry import CallTrace, percentile  # noqa: E402
+
+FRAGE = "Was ist dein Lieblingsessen?"
+ASSISTANT_ID = "asst_bench"
+MODEL = "mock-model"
+
+# Benchmark-Backends: Name -> (Scoring-Backend, Paketgröße)
+BACKENDS = {
+    "assistants": (BACKEND_ASSISTANTS, 1),
+    "chat": (BACKEND_CHAT, 1),
+    "packed": (BACKEND_CHAT, DEFAULT_PACK_SIZE),
+}
+
+LEVELS = ["antworten", "job"]
+
+
+def new_governor():
+    """Governor ohne eigenes Limit; ist am Server ein Rate Limit eingestellt, übernimmt er es aus den Headern."""
+    return RateGovernor(requests_per_minute=10**6, tokens_per_minute=10**9)
+
+
+def make_antworten(size, duplicate_share):
+    """size Antworten, davon der Anteil duplicate_share Wiederholungen früherer Antworten."""
+    unique = max(1, round(size * (1 - duplicate_share)))
+    return [f"Antwort Nummer {index % unique}: Pizza mit viel Käse" for index in range(size)]
+
+
+def score_level_antworten(client, backend, pack_size, antworten, governor, max_workers, journal_dir):
+    scorer = make_scorer(client, backend=backend, assistant_id=ASSISTANT_ID, model=MODEL,
+                         instructions=DEFAULT_SYSTEM_PROMPT, packed=pack_size > 1, governor=governor)
+    results = list(score_antworten(FRAGE, antworten, scorer, max_workers=max_workers, pack_size=pack_size))
+    latencies = [result["latency"] for _, result, fehler in results if fehler is None]
+    return latencies, sum(fehler is not None for _, _, fehler in results)
+
+
+def score_level_job(client, backend, pack_size, antworten, governor, max_workers, journal_dir):
+    settings = {
+        "backend": backend,
+        "system_prompt": DEFAULT_SYSTEM_PROMPT,
+        "model": MODEL,
+        "pack_size": pack_size,
+        "max_workers": max_workers,
+        "deduplicate": True,
+        "use_cache": False,
+        "assistant_instructions": DEFAULT_SYSTEM_PROMPT,
+        "assistant_model": MODEL,
+    }
+    job = ScoringJob(JobJournal.create(journal_dir, FRAGE, antworten, settings), "bench", trace=CallTrace(maxlen=len(antworten)))
+    run_job(job, client, ASSISTANT_ID, governor=governor)
+    latencies = [record["latency"] for record in job.trace.records() if record["latency"] is not None]
+    return latencies, job.error_count
+
+
+def mock_request(port, path, method="GET"):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", method=method)
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def measure(port, function, *args, memory=True):
+    """Führt function aus; gibt Dauer, Latenzen, Fehler, HTTP-Statistik des Servers und Speicher-Peak zurück.
+
+    Zeit und Speicher werden wie in bench_export.py in getrennten Läufen gemessen,
+    tracemalloc bremst die Worker-Threads stark.
+    """
+    mock_request(port, "/mock/reset", "POST")
+    start = time.perf_counter()
+    latencies, errors = function(*args)
+    elapsed = time.perf_counter() - start
+    stats = mock_request(port, "/mock/stats")
+    peak = None
+    if memory:
+        tracemalloc.start()
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return elapsed, latencies, errors, stats, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500, 2500])
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--levels", nargs="+", choices=LEVELS, default=LEVELS)
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS)
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Anteil doppelter Antworten (0-1)")
+    parser.add_argument("--port", type=int, default=8798)
+    parser.add_argument("--latency", type=float, default=0.02, help="Mittlere Latenz pro HTTP-Anfrage in Sekunden")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--run-time", type=float, default=0.2, help="Mittlere Dauer eines Assistants-Runs in Sekunden")
+    parser.add_argument("--poll-after-ms", type=int, default=100, help="Abfrageintervall für Runs")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Modell-Anfragen mit 500")
+    parser.add_argument("--run-failure-rate", type=float, default=0.0, help="Anteil fehlschlagender Runs")
+    parser.add_argument("--requests-per-minute", type=int, default=0, help="Rate Limit des Servers (0 = unbegrenzt)")
+    parser.add_argument("--no-memory", action="store_true", help="Speicher-Peak nicht messen (spart den zweiten Lauf)")
+    args = parser.parse_args()
+
+    server = spawn(
+        args.port,
+        "--latency", args.latency, "--latency-distribution", args.latency_distribution,
+        "--run-time", args.run_time, "--poll-after-ms", args.poll_after_ms, "--error-rate", args.error_rate,
+        "--run-failure-rate", args.run_failure_rate, "--requests-per-minute", args.requests_per_minute
+    )
+    client = OpenAI(api_key="test", base_url=f"http://127.0.0.1:{args.port}/v1")
+    levels = {"antworten": score_level_antworten, "job": score_level_job}
+
+    print(f"{'Ebene':<10} {'Backend':<11} {'Antworten':>9} {'Antw./s':>8} {'p50 (s)':>8} {'p99 (s)':>8} "
+          f"{'HTTP/Antw.':>10} {'429':>5} {'500':>5} {'Fehler':>6} {'Peak (MiB)':>10}")
+    try:
+        # Aufwärmlauf ohne Ausgabe: Importe, Verbindungsaufbau und Worker-Threads nicht mitmessen
+        for backend, pack_size in BACKENDS.values():
+            score_level_antworten(client, backend, pack_size, make_antworten(2 * args.max_workers, 0), new_governor(), args.max_workers, None)
+
+        with tempfile.TemporaryDirectory() as journal_dir:
+            for level in args.levels:
+                for name in args.backends:
+                    backend, pack_size = BACKENDS[name]
+                    for size in args.sizes:
+                        elapsed, latencies, errors, stats, peak = measure(
+                            args.port, levels[level], client, backend, pack_size,
+                            make_antworten(size, args.duplicates), new_governor(), args.max_workers, journal_dir,
+                            memory=not args.no_memory
+                        )
+                        rate_limited, server_errors = stats.pop("rate_limited", 0), stats.pop("server_errors", 0)
+                        print(f"{level:<10} {name:<11} {size:>9} {size / elapsed:>8.1f} "
+                              f"{percentile(latencies, 50) or 0:>8.3f} {percentile(latencies, 99) or 0:>8.3f} "
+                              f"{sum(stats.values()) / size:>10.2f} {rate_limited:>5} {server_errors:>5} {errors:>6} "
+                              f"{'-' if peak is None else f'{peak:.1f}':>10}")
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,518 @@
+"""Lokaler Ersatz-Server für die OpenAI-Endpunkte, die BonsAI_Score verwendet.
+
+Damit lassen sich alle Backends ohne echte API-Kosten testen und messen (siehe
+tools/bench_scoring.py). Der Server implementiert Datei-Upload, Batch-Jobs, Chat
+Completions, Assistants sowie Threads mit Nachrichten und Runs und vergibt zufällige,
+aber für jede Nachricht stabile Scores.
+
+Fehler und Last lassen sich einstellen:
+- ein Anteil der Batch-Anfragen bzw. der Runs schlägt fehl (server_error),
+- Modell-Anfragen (Chat Completions, neue Nachrichten und Runs) liefern x-ratelimit-Header,
+  antworten über dem eingestellten Limit mit 429 und Retry-After und können zufällig
+  mit 500 fehlschlagen,
+- Latenz pro HTTP-Anfrage und Dauer eines Runs folgen einer wählbaren Verteilung.
+Unter /mock/stats stehen die Anzahl der HTTP-Anfragen pro Endpunkt, /mock/reset setzt sie zurück.
+
+Start:
+    python tools/mock_openai_server.py --port 8000 --failure-rate 0.1 --requests-per-minute 600
+    python tools/mock_openai_server.py --latency 0.05 --latency-distribution lognormal --run-time 0.5
+
+In .streamlit/secrets.toml dann:
+    [openai]
+    api_key = "test"
+    base_url = "http://localhost:8000/v1"
+"""
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import collections
+import itertools
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Laufende Nummern für IDs
+_ids = itertools.count(1)
+_lock = threading.RLock()
+
+# Gespeicherte Dateien, Batch-Jobs, Assistants, Threads mit ihren Nachrichten und Runs
+files = {}
+batches = {}
+assistants = {}
+threads = {}
+thread_messages = {}
+runs = {}
+
+# Anzahl der HTTP-Anfragen pro Endpunkt sowie simulierter 429- und 500-Antworten
+stats = collections.Counter()
+
+# Einstellungen, werden in main() aus den Kommandozeilenargumenten gesetzt
+config = {
+    "failure_rate": 0.0, "batch_delay": 2.0, "latency": 0.0, "latency_distribution": "fixed",
+    "requests_per_minute": 0, "error_rate": 0.0, "run_time": 0.0, "run_failure_rate": 0.0, "poll_after_ms": 0,
+}
+
+# Verteilungen für Latenz und Run-Dauer; alle haben den eingestellten Wert als Mittelwert
+LATENCY_DISTRIBUTIONS = ["fixed", "uniform", "exponential", "lognormal"]
+LOGNORMAL_SIGMA = 0.75
+
+# Status, in denen ein Run nicht mehr weiterläuft
+TERMINAL_RUN_STATUS = {"completed", "failed", "cancelled", "expired", "incomplete"}
+
+# Zustand des Rate Limits für Modell-Anfragen (Token-Bucket wie bei der echten API)
+rate_state = {"remaining": 0.0, "updated": time.monotonic()}
+
+
+def new_id(prefix):
+    with _lock:
+        return f"{prefix}_{next(_ids)}"
+
+
+def draw(mean):
+    """Zufällige Dauer mit Mittelwert mean nach config["latency_distribution"]."""
+    if mean <= 0:
+        return 0.0
+    distribution = config["latency_distribution"]
+    if distribution == "uniform":
+        return random.uniform(0, 2 * mean)
+    if distribution == "exponential":
+        return random.expovariate(1 / mean)
+    if distribution == "lognormal":
+        return random.lognormvariate(math.log(mean) - LOGNORMAL_SIGMA ** 2 / 2, LOGNORMAL_SIGMA)
+    return mean
+
+
+def fake_codierung(content, instructions=""):
+    """Erzeugt eine stabile Codierung im Format des System Prompts; andere Anweisungen ergeben andere Scores."""
+    seed = int(hashlib.sha256(f"{instructions}\n{content}".encode("utf-8")).hexdigest(), 16)
+    rng = random.Random(seed)
+    scores = [rng.randint(0, 100) for _ in range(4)] + [100]
+    gesamt = round(sum(scores) / len(scores))
+    return (f"Relevanz: {scores[0]}; Klarheit: {scores[1]}; Detailgrad: {scores[2]}; "
+            f"Grammatik und Stil: {scores[3]}; Sprache: {scores[4]};Gesamt: {gesamt}")
+
+
+def chat_completion(body):
+    """Antwort für einen Chat-Completions-Aufruf; gebündelte Anfragen erhalten eine Zeile pro Antwort."""
+    messages = body.get("messages", [])
+    content = messages[-1]["content"] if messages else ""
+    instructions = messages[0]["content"] if len(messages) > 1 and messages[0]["role"] == "system" else ""
+    if "Zu bewertende Antworten:\n" in content:
+        lines = content.split("Zu bewertende Antworten:\n", 1)[1].splitlines()
+        answer = "\n".join(f"{line.split(':', 1)[0]}: {fake_codierung(line, instructions)}" for line in lines)
+    else:
+        answer = fake_codierung(content, instructions)
+
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(answer) // 4
+    return {
+        "id": new_id("chatcmpl"),
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": answer}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def take_request():
+    """Bucht eine Anfrage vom Rate Limit ab; gibt (erlaubt, verbleibend, sekunden_bis_frei) zurück."""
+    limit = config["requests_per_minute"]
+    with _lock:
+        now = time.monotonic()
+        rate_state["remaining"] = min(limit, rate_state["remaining"] + (now - rate_state["updated"]) * limit / 60)
+        rate_state["updated"] = now
+        if rate_state["remaining"] < 1:
+            return False, 0, (1 - rate_state["remaining"]) * 60 / limit
+        rate_state["remaining"] -= 1
+        return True, int(rate_state["remaining"]), (limit - rate_state["remaining"]) * 60 / limit
+
+
+def assistant_object(assistant_id):
+    """Ein Assistant wird beim ersten Abruf mit dem Standard-Prompt angelegt."""
+    if assistant_id not in assistants:
+        assistants[assistant_id] = {
+            "id": assistant_id, "object": "assistant", "created_at": int(time.time()), "name": "Mock",
+            "description": None, "model": "mock-model", "instructions": "Mock-Anweisungen",
+            "tools": [], "metadata": {},
+        }
+    return assistants[assistant_id]
+
+
+def message_object(thread_id, role, text, run_id=None, assistant_id=None):
+    return {
+        "id": new_id("msg"), "object": "thread.message", "created_at": int(time.time()), "thread_id": thread_id,
+        "role": role, "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+        "assistant_id": assistant_id, "run_id": run_id, "attachments": [], "metadata": {}, "status": "completed",
+    }
+
+
+def run_object(run_id):
+    """Aktueller Stand eines Runs; nach Ablauf seiner Dauer wird er abgeschlossen oder schlägt fehl."""
+    with _lock:
+        run = runs[run_id]
+        if run["status"] not in TERMINAL_RUN_STATUS:
+            if time.monotonic() < run["_complete_at"]:
+                run["status"] = "in_progress"
+            elif run["_fails"]:
+                run.update(status="failed", failed_at=int(time.time()),
+                           last_error={"code": "server_error", "message": "Simulierter Fehler im Run"})
+            else:
+                messages = thread_messages[run["thread_id"]]
+                content = next((m["content"][0]["text"]["value"] for m in reversed(messages) if m["role"] == "user"), "")
+                answer = fake_codierung(content, run["instructions"] or "")
+                messages.append(message_object(run["thread_id"], "assistant", answer, run_id, run["assistant_id"]))
+                # Der ganze Verlauf des Threads geht in den Prompt ein
+                prompt_tokens = (len(run["instructions"] or "") + sum(len(m["content"][0]["text"]["value"]) for m in messages)) // 4
+                completion_tokens = len(answer) // 4
+                run.update(status="completed", completed_at=int(time.time()), usage={
+                    "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                })
+        return {key: value for key, value in run.items() if not key.startswith("_")}
+
+
+def file_object(file_id):
+    data = files[file_id]
+    return {"id": file_id, "object": "file", "bytes": len(data["content"]), "created_at": data["created_at"],
+            "filename": data["filename"], "purpose": data["purpose"], "status": "processed"}
+
+
+def store_file(content, filename, purpose):
+    file_id = new_id("file")
+    files[file_id] = {"content": content, "filename": filename, "purpose": purpose, "created_at": int(time.time())}
+    return file_id
+
+
+def process_batch(batch_id):
+    """Arbeitet einen Batch-Job im Hintergrund ab und schreibt Ergebnis- und Fehlerdatei."""
+    batch = batches[batch_id]
+    time.sleep(config["batch_delay"])
+    if batch["status"] == "cancelled":
+        return
+    batch["status"] = "in_progress"
+    batch["in_progress_at"] = int(time.time())
+
+    output_lines, error_lines = [], []
+    for raw_line in files[batch["input_file_id"]]["content"].splitlines():
+        if not raw_line.strip():
+            continue
+        request = json.loads(raw_line)
+        if random.random() < config["failure_rate"]:
+            error_lines.append({
+                "id": new_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 500, "request_id": new_id("req"),
+                             "body": {"error": {"message": "Simulierter Serverfehler", "type": "server_error"}}},
+                "error": None,
+            })
+        else:
+            output_lines.append({
+                "id": new_id("batch_req"),
+                "custom_id": request["custom_id"],
+                "response": {"status_code": 200, "request_id": new_id("req"), "body": chat_completion(request["body"])},
+                "error": None,
+            })
+
+    def to_jsonl(lines):
+        return "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+
+    if output_lines:
+        batch["output_file_id"] = store_file(to_jsonl(output_lines), f"{batch_id}_output.jsonl", "batch_output")
+    if error_lines:
+        batch["error_file_id"] = store_file(to_jsonl(error_lines), f"{batch_id}_error.jsonl", "batch_output")
+    batch["request_counts"] = {"total": len(output_lines) + len(error_lines),
+                               "completed": len(output_lines), "failed": len(error_lines)}
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    routes = []
+
+    # Header und Body gehen in getrennten Schreibvorgängen raus; ohne diese Einstellung
+    # verzögert Nagle zusammen mit Delayed ACK jede Antwort um etwa 40 ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200, headers=None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_not_found(self):
+        self.send_json({"error": {"message": f"Unbekannter Pfad: {self.path}", "type": "invalid_request_error"}}, 404)
+
+    def read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def dispatch(self, method):
+        path = self.path.split("?", 1)[0]
+        for route_method, pattern, handler in self.routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                if not path.startswith("/mock/"):
+                    with _lock:
+                        stats[handler.__name__] += 1
+                    time.sleep(draw(config["latency"]))
+                return handler(self, *match.groups())
+        self.send_not_found()
+
+    def admit(self):
+        """Rate Limit und zufällige Serverfehler für Modell-Anfragen.
+
+        Gibt die x-ratelimit-Header für die Antwort zurück oder None, wenn bereits mit
+        429 bzw. 500 geantwortet wurde.
+        """
+        headers = {}
+        if config["requests_per_minute"]:
+            allowed, remaining, reset = take_request()
+            headers = {
+                "x-ratelimit-limit-requests": str(config["requests_per_minute"]),
+                "x-ratelimit-remaining-requests": str(remaining),
+                "x-ratelimit-reset-requests": f"{reset * 1000:.0f}ms",
+            }
+            if not allowed:
+                headers["retry-after-ms"] = f"{reset * 1000:.0f}"
+                with _lock:
+                    stats["rate_limited"] += 1
+                self.send_json({"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, 429, headers)
+                return None
+        if random.random() < config["error_rate"]:
+            with _lock:
+                stats["server_errors"] += 1
+            self.send_json({"error": {"message": "Interner Serverfehler", "type": "server_error"}}, 500, headers)
+            return None
+        return headers
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    # Endpunkte
+
+    def create_file(self):
+        header = f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8")
+        message = email.parser.BytesParser(policy=email.policy.default).parsebytes(header + self.read_body())
+        content, filename, purpose = b"", "upload", "batch"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                content, filename = part.get_payload(decode=True), part.get_filename() or filename
+            elif name == "purpose":
+                purpose = part.get_payload(decode=True).decode("utf-8")
+        self.send_json(file_object(store_file(content, filename, purpose)))
+
+    def retrieve_file(self, file_id):
+        if file_id not in files:
+            return self.send_not_found()
+        self.send_json(file_object(file_id))
+
+    def file_content(self, file_id):
+        if file_id not in files:
+            return self.send_not_found()
+        content = files[file_id]["content"]
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def create_batch(self):
+        body = json.loads(self.read_body())
+        if body.get("input_file_id") not in files:
+            return self.send_json({"error": {"message": "input_file_id unbekannt", "type": "invalid_request_error"}}, 400)
+        batch_id = new_id("batch")
+        batches[batch_id] = {
+            "id": batch_id, "object": "batch", "endpoint": body["endpoint"], "errors": None,
+            "input_file_id": body["input_file_id"], "completion_window": body["completion_window"],
+            "status": "validating", "output_file_id": None, "error_file_id": None,
+            "created_at": int(time.time()), "in_progress_at": None, "completed_at": None,
+            "expires_at": int(time.time()) + 86400, "metadata": body.get("metadata"),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        threading.Thread(target=process_batch, args=(batch_id,), daemon=True).start()
+        self.send_json(batches[batch_id])
+
+    def retrieve_batch(self, batch_id):
+        if batch_id not in batches:
+            return self.send_not_found()
+        self.send_json(batches[batch_id])
+
+    def cancel_batch(self, batch_id):
+        self.read_body()
+        if batch_id not in batches:
+            return self.send_not_found()
+        batch = batches[batch_id]
+        if batch["status"] in ("validating", "in_progress"):
+            batch["status"] = "cancelled"
+            batch["cancelled_at"] = int(time.time())
+        self.send_json(batch)
+
+    def retrieve_assistant(self, assistant_id):
+        self.send_json(assistant_object(assistant_id))
+
+    def update_assistant(self, assistant_id):
+        body = json.loads(self.read_body())
+        assistant = assistant_object(assistant_id)
+        assistant.update({key: value for key, value in body.items() if key in ("instructions", "model", "name")})
+        self.send_json(assistant)
+
+    def create_thread(self):
+        self.read_body()
+        thread_id = new_id("thread")
+        threads[thread_id] = {"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}}
+        thread_messages[thread_id] = []
+        self.send_json(threads[thread_id])
+
+    def retrieve_thread(self, thread_id):
+        if thread_id not in threads:
+            return self.send_not_found()
+        self.send_json(threads[thread_id])
+
+    def create_message(self, thread_id):
+        body = json.loads(self.read_body())
+        if thread_id not in threads:
+            return self.send_not_found()
+        headers = self.admit()
+        if headers is None:
+            return
+        message = message_object(thread_id, body.get("role", "user"), body.get("content", ""))
+        with _lock:
+            thread_messages[thread_id].append(message)
+        self.send_json(message, headers=headers)
+
+    def list_messages(self, thread_id):
+        if thread_id not in threads:
+            return self.send_not_found()
+        with _lock:
+            data = list(reversed(thread_messages[thread_id][-20:]))
+        self.send_json({"object": "list", "data": data, "first_id": data[0]["id"] if data else None,
+                        "last_id": data[-1]["id"] if data else None, "has_more": len(thread_messages[thread_id]) > 20})
+
+    def create_run(self, thread_id):
+        body = json.loads(self.read_body())
+        if thread_id not in threads:
+            return self.send_not_found()
+        headers = self.admit()
+        if headers is None:
+            return
+        assistant = assistant_object(body["assistant_id"])
+        run_id = new_id("run")
+        runs[run_id] = {
+            "id": run_id, "object": "thread.run", "created_at": int(time.time()), "thread_id": thread_id,
+            "assistant_id": assistant["id"], "status": "queued", "model": body.get("model") or assistant["model"],
+            "instructions": body.get("instructions") or assistant["instructions"], "tools": [], "metadata": {},
+            "last_error": None, "usage": None, "parallel_tool_calls": True,
+            "_complete_at": time.monotonic() + draw(config["run_time"]),
+            "_fails": random.random() < config["run_failure_rate"],
+        }
+        self.send_json(run_object(run_id), headers=headers)
+
+    def retrieve_run(self, thread_id, run_id):
+        if run_id not in runs:
+            return self.send_not_found()
+        headers = {"openai-poll-after-ms": str(config["poll_after_ms"])} if config["poll_after_ms"] else None
+        self.send_json(run_object(run_id), headers=headers)
+
+    def create_chat_completion(self):
+        body = json.loads(self.read_body())
+        headers = self.admit()
+        if headers is None:
+            return
+        self.send_json(chat_completion(body), headers=headers)
+
+    def mock_stats(self):
+        with _lock:
+            self.send_json(dict(stats))
+
+    def mock_reset(self):
+        with _lock:
+            stats.clear()
+        self.send_json({})
+
+
+MockOpenAIHandler.routes = [
+    ("POST", r"/v1/files", MockOpenAIHandler.create_file),
+    ("GET", r"/v1/files/([^/]+)", MockOpenAIHandler.retrieve_file),
+    ("GET", r"/v1/files/([^/]+)/content", MockOpenAIHandler.file_content),
+    ("POST", r"/v1/batches", MockOpenAIHandler.create_batch),
+    ("GET", r"/v1/batches/([^/]+)", MockOpenAIHandler.retrieve_batch),
+    ("POST", r"/v1/batches/([^/]+)/cancel", MockOpenAIHandler.cancel_batch),
+    ("POST", r"/v1/chat/completions", MockOpenAIHandler.create_chat_completion),
+    ("GET", r"/v1/assistants/([^/]+)", MockOpenAIHandler.retrieve_assistant),
+    ("POST", r"/v1/assistants/([^/]+)", MockOpenAIHandler.update_assistant),
+    ("POST", r"/v1/threads", MockOpenAIHandler.create_thread),
+    ("GET", r"/v1/threads/([^/]+)", MockOpenAIHandler.retrieve_thread),
+    ("POST", r"/v1/threads/([^/]+)/messages", MockOpenAIHandler.create_message),
+    ("GET", r"/v1/threads/([^/]+)/messages", MockOpenAIHandler.list_messages),
+    ("POST", r"/v1/threads/([^/]+)/runs", MockOpenAIHandler.create_run),
+    ("GET", r"/v1/threads/([^/]+)/runs/([^/]+)", MockOpenAIHandler.retrieve_run),
+    ("GET", r"/mock/stats", MockOpenAIHandler.mock_stats),
+    ("POST", r"/mock/reset", MockOpenAIHandler.mock_reset),
+]
+
+
+def spawn(port, *options):
+    """Startet den Server als Unterprozess (z.B. für Benchmarks) und wartet, bis er Anfragen annimmt."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", str(port), *map(str, options)],
+        stdout=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/mock/stats")
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Mock-Server startet nicht")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokaler Ersatz-Server für die OpenAI API")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Anteil fehlschlagender Batch-Anfragen (0-1)")
+    parser.add_argument("--batch-delay", type=float, default=2.0, help="Sekunden bis ein Batch-Job startet")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mittlere zusätzliche Latenz pro HTTP-Anfrage in Sekunden")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="fixed",
+                        help="Verteilung von Latenz und Run-Dauer um ihren Mittelwert")
+    parser.add_argument("--requests-per-minute", type=int, default=0, help="Rate Limit für Modell-Anfragen (0 = unbegrenzt)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Anteil der Modell-Anfragen, die mit 500 fehlschlagen (0-1)")
+    parser.add_argument("--run-time", type=float, default=0.0, help="Mittlere Dauer eines Assistants-Runs in Sekunden")
+    parser.add_argument("--run-failure-rate", type=float, default=0.0, help="Anteil der Runs, die mit server_error fehlschlagen (0-1)")
+    parser.add_argument("--poll-after-ms", type=int, default=0,
+                        help="Abfrageintervall für Runs im Header openai-poll-after-ms (0 = Standard des SDK, 1 s)")
+    args = parser.parse_args()
+
+    config.update(failure_rate=args.failure_rate, batch_delay=args.batch_delay, latency=args.latency,
+                  latency_distribution=args.latency_distribution, requests_per_minute=args.requests_per_minute,
+                  error_rate=args.error_rate, run_time=args.run_time, run_failure_rate=args.run_failure_rate,
+                  poll_after_ms=args.poll_after_ms)
+    rate_state["remaining"] = float(args.requests_per_minute)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), MockOpenAIHandler)
+    print(f"Mock-OpenAI-Server läuft auf http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Einlesen von Excel-Arbeitsmappen mit mehreren offenen Fragen.
+
+Jede Frage steht in einer eigenen Spalte. Die Mappe wird im Read-only-Modus von
+openpyxl zeilenweise gelesen, ohne Formatierungen und Zellobjekte aufzubauen. Nach der
+Bewertung werden pro Frage die Codierung und die Score-Spalten neben die
+Originaldaten geschrieben.
+"""
+import openpyxl
+import pandas as pd
+
+from score_stats import PARSE_FLAG_COLUMN, parse_codierungen
+
+
+class SheetData:
+    """Werte eines Tabellenblatts: eindeutige Spaltennamen und die Datenzeilen als Tupel."""
+
+    def __init__(self, name, header, rows):
+        self.name = name
+        self.header = header
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def list_sheets(file):
+    """Namen aller Tabellenblätter einer Arbeitsmappe."""
+    workbook = openpyxl.load_workbook(file, read_only=True)
+    try:
+        return workbook.sheetnames
+    finally:
+        workbook.close()
+
+
+def _unique_header(values):
+    # Leere und doppelte Spaltenüberschriften eindeutig machen
+    header, seen = [], set()
+    for position, value in enumerate(values, 1):
+        name = str(value).strip() if value is not None and str(value).strip() else f"Spalte {position}"
+        candidate, suffix = name, 2
+        while candidate in seen:
+            candidate, suffix = f"{name} ({suffix})", suffix + 1
+        seen.add(candidate)
+        header.append(candidate)
+    return header
+
+
+def read_sheet(file, sheet=None):
+    """Liest ein Tabellenblatt (Standard: aktives Blatt); die erste Zeile enthält die Spaltenüberschriften.
+
+    Leere Zeilen am Ende, wie sie Excel häufig mitspeichert, werden verworfen.
+    """
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet] if sheet else workbook.active
+        values = worksheet.iter_rows(values_only=True)
+        first_row = next(values, ())
+        rows = []
+        last_filled = 0
+        for row in values:
+            rows.append(row)
+            if any(value is not None and str(value).strip() for value in row):
+                last_filled = len(rows)
+        del rows[last_filled:]
+        width = max([len(first_row), *(len(row) for row in rows)]) if rows or first_row else 0
+        header = _unique_header(list(first_row) + [None] * (width - len(first_row)))
+        return SheetData(worksheet.title, header, rows)
+    finally:
+        workbook.close()
+
+
+def column_answers(sheet_data, column):
+    """Nicht leere Antworten einer Spalte; gibt (zeilen, antworten) mit den Positionen der Datenzeilen zurück."""
+    position = sheet_data.header.index(column)
+    zeilen, antworten = [], []
+    for zeile, row in enumerate(sheet_data.rows):
+        value = row[position] if position < len(row) else None
+        antwort = "" if value is None else str(value).strip()
+        if antwort:
+            zeilen.append(zeile)
+            antworten.append(antwort)
+    return zeilen, antworten
+
+
+def build_workbook_results(sheet_data, fragen_results):
+    """Originaldaten mit Codierung und Score-Spalten pro Frage rechts daneben.
+
+    fragen_results ist eine Liste von (spalte, zeilen, codierungen); die neuen Spalten
+    heißen "<Spalte>: Codierung", "<Spalte>: Relevanz" usw.
+    """
+    width = len(sheet_data.header)
+    df = pd.DataFrame([tuple(row) + (None,) * (width - len(row)) for row in sheet_data.rows], columns=sheet_data.header)
+    for spalte, zeilen, codierungen in fragen_results:
+        codierung_column = pd.Series(codierungen, index=zeilen, dtype=object).reindex(df.index)
+        scores = parse_codierungen(codierung_column)
+        # Zeilen ohne Antwort sind nicht "nicht auswertbar", sondern leer
+        scores[PARSE_FLAG_COLUMN] = scores[PARSE_FLAG_COLUMN].astype("boolean").mask(codierung_column.isna())
+        df[f"{spalte}: Codierung"] = codierung_column
+        for kriterium in scores.columns:
+            df[f"{spalte}: {kriterium}"] = scores[kriterium]
+    return df